@@ -0,0 +1,215 @@
+"""Times the simulation hot paths and writes the results as JSON.
+
+    python benchmarks/benchmark_model.py --output benchmarks/results.json
+    python benchmarks/benchmark_model.py --quick
+
+Each entry records the benchmark, its parameters, the per-call wall times and
+the peak traced memory of one extra call, so runs can be compared across commits.
+"""
+import argparse
+import copy
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from guinea_worm.model_wrapper import GuineaWormModel
+from guinea_worm.sweep import run_sweep
+from guinea_worm.tools import process_data
+
+# Initial infected copepods and number of steps simulated before timing, so the
+# hosts carry the worm burden of each regime
+PREVALENCE_REGIMES = {
+    "low": {"infectivity_rate": 0.0005, "burn_in_steps": 4},
+    "high": {"infectivity_rate": 0.3, "burn_in_steps": 24},
+}
+
+
+def model_configuration(num_individuals: int, max_worm_age: int, timestep: int, infectivity_rate: float, years: int = 1) -> dict:
+    return {
+        "sink_info": [{
+            "population_name": "copepod",
+            "infectivity_rate": infectivity_rate,
+            "density": 250,
+            "size": 4500,
+            "larval_death_rate": 1/30,
+        }],
+        "host_info": [{
+            "num_individuals": num_individuals,
+            "population_name": "dogs",
+            "mortality_rate": (1/5)/360,
+            "worm_death_rate": 1/360,
+            "worm_mating_probability": 1,
+            "ke": 0.3,
+            "initial_infected": 0,
+            "worm_maturity_age_days": 0,
+            "max_worm_age": max_worm_age,
+            "sink_interaction_values": {"copepod": {"interaction": np.full(num_individuals, 1)}},
+        }],
+        "model_info": {
+            "time": 0,
+            "timestep": timestep,
+            "endtime": 360 * years,
+            "r0": 3,
+            "NcNd": 20,
+            "transmission_asymmetry": 1.2,
+        },
+    }
+
+
+def burnt_in_model(num_individuals: int, max_worm_age: int, timestep: int, regime: str) -> GuineaWormModel:
+    regime_values = PREVALENCE_REGIMES[regime]
+    gw_model = GuineaWormModel(
+        **model_configuration(num_individuals, max_worm_age, timestep, regime_values["infectivity_rate"], years=10),
+        seed=0,
+    )
+    for _ in range(regime_values["burn_in_steps"]):
+        gw_model.model.iterateModel()
+    return gw_model
+
+
+def measure(function, repeats: int, setup=None) -> dict:
+    # setup() builds the argument passed to function, outside of the timed region
+    seconds = []
+    for _ in range(repeats):
+        argument = setup() if setup is not None else None
+        start = time.perf_counter()
+        function(argument)
+        seconds.append(time.perf_counter() - start)
+
+    argument = setup() if setup is not None else None
+    tracemalloc.start()
+    function(argument)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "repeats": repeats,
+        "seconds_min": min(seconds),
+        "seconds_median": float(np.median(seconds)),
+        "seconds": seconds,
+        "peak_bytes": peak_bytes,
+    }
+
+
+def hot_path_benchmarks(gw_model: GuineaWormModel, timestep: int, repeats: int) -> dict:
+    model = gw_model.model
+    host_population = model.host_populations["dogs"]
+
+    def fresh_model(_=None):
+        return copy.deepcopy(gw_model).model
+
+    return {
+        "Worms.age": measure(
+            lambda fresh: fresh.host_populations["dogs"].worm_pop.age(timestep), repeats, fresh_model
+        ),
+        "HostPopulation.age": measure(
+            lambda fresh: fresh.host_populations["dogs"].age(timestep), repeats, fresh_model
+        ),
+        "Model.check_for_exposure_event": measure(
+            lambda fresh: fresh.check_for_exposure_event(), repeats, fresh_model
+        ),
+        "Model.printPopulationStats": measure(
+            lambda fresh: fresh.printPopulationStats(), repeats, fresh_model
+        ),
+        "HostPopulation.stats": measure(lambda _: host_population.stats(), repeats),
+        "tools.process_data": measure(lambda _: process_data(model.results), repeats),
+    }
+
+
+def end_to_end_benchmarks(num_individuals: int, repeats: int, years: int) -> dict:
+    configuration = model_configuration(num_individuals, 360, 15, 0.25, years=years)
+
+    def full_run(_):
+        GuineaWormModel(**copy.deepcopy(configuration), seed=0).iterateFullModel()
+
+    sweep_configuration = copy.deepcopy(configuration)
+    sweep_configuration["sink_info"][0]["infectivity_rate"] = None
+    sweep_configuration["model_info"].update({"r0": None, "reporting_interval": 360})
+
+    def reduced_sweep(_):
+        run_sweep(
+            {"infectivity_rate": [0.25, 0.05], "r0": [1.0, 3.0]},
+            **copy.deepcopy(sweep_configuration),
+            num_replicates=2,
+            points_per_batch=4,
+            seed=0,
+        )
+
+    return {
+        "GuineaWormModel.iterateFullModel": measure(full_run, repeats),
+        "run_sweep (4 points x 2 replicates)": measure(reduced_sweep, repeats),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="JSON file to write, stdout when omitted")
+    parser.add_argument("--quick", action="store_true", help="small host counts and few repeats")
+    parser.add_argument("--repeats", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.quick:
+        host_counts, max_worm_ages, timesteps, repeats, years = [1000], [360], [15], 3, 1
+    else:
+        host_counts, max_worm_ages, timesteps, repeats, years = [1000, 10000, 100000], [180, 360], [1, 15], 5, 2
+    if args.repeats is not None:
+        repeats = args.repeats
+
+    results = []
+    for num_individuals, max_worm_age, timestep, regime in itertools.product(
+        host_counts, max_worm_ages, timesteps, PREVALENCE_REGIMES
+    ):
+        parameters = {
+            "num_individuals": num_individuals,
+            "max_worm_age": max_worm_age,
+            "timestep": timestep,
+            "prevalence": regime,
+        }
+        gw_model = burnt_in_model(num_individuals, max_worm_age, timestep, regime)
+        parameters["female_worm_prev"] = float(gw_model.model.host_populations["dogs"].stats()["female_worm_prev"][0])
+        for benchmark, timings in hot_path_benchmarks(gw_model, timestep, repeats).items():
+            results.append({"benchmark": benchmark, "parameters": parameters, **timings})
+        print(f"{parameters} done", file=sys.stderr)
+
+    for num_individuals in host_counts[:2]:
+        for benchmark, timings in end_to_end_benchmarks(num_individuals, max(1, repeats // 2), years).items():
+            results.append({
+                "benchmark": benchmark,
+                "parameters": {"num_individuals": num_individuals, "years": years},
+                **timings,
+            })
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=1)
+    else:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=1)
+
+
+if __name__ == "__main__":
+    main()
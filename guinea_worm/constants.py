@@ -1,3 +1,21 @@
 SINKS = ["copepod"]
 
-HOSTS = ["dogs"]
\ No newline at end of file
+HOSTS = ["dogs"]
+
+# Reported measure name -> key in the population's stats()
+HOST_MEASURES = {
+    "female_worm_prev": "female_worm_prev",
+    "total_worm_load": "total_worm_load_per_person",
+    "female_worm_load": "female_worm_load_per_person",
+}
+
+SINK_MEASURES = {
+    "infective_larvae": "infective_larvae",
+}
+
+# Every measure Model can report. The emergence measure is reported once per
+# sink the host population interacts with, as emergence_{sink name}.
+REPORTED_MEASURES = [*HOST_MEASURES, "emergence", "Re", *SINK_MEASURES]
+
+# Supported Intervention.intervention_name values
+INTERVENTIONS = ["tethering", "abate", "water_treatment"]
@@ -0,0 +1,137 @@
+import multiprocessing
+import traceback
+import numpy as np
+import pandas as pd
+from .model_wrapper import GuineaWormModel
+from .model.exchange import Connectivity, PipeExchange
+from .sweep import lane_configuration, seed_sequence
+from .tools import process_data
+
+# A metapopulation is a network of patches (villages), each with the host and sink
+# populations of sink_info and host_info. The patches are the replicates of a single
+# model, so one step updates every patch at once, and the model's PatchExchange
+# couples them through the connectivity matrix. Per-patch values of the sweepable
+# parameters (r0, transmission_asymmetry, NcNd, infectivity_rate) go in patch_parameters.
+
+
+def partition_patches(num_patches: int, num_partitions: int) -> list[list[int]]:
+    # Contiguous blocks of patches, one per process
+    return np.array_split(np.arange(num_patches), num_partitions)
+
+
+def build_patch_model(
+    sink_info: list[dict],
+    host_info: list[dict],
+    model_info: dict,
+    patches: list[int],
+    patch_parameters: dict[str, list[float]],
+    seed: np.random.SeedSequence,
+) -> GuineaWormModel:
+    sink_info, model_info = lane_configuration(
+        sink_info, model_info,
+        {name: np.asarray(values, dtype=float)[patches] for name, values in patch_parameters.items()}
+    )
+    return GuineaWormModel(
+        sink_info=sink_info,
+        host_info=host_info,
+        model_info=model_info,
+        seed=seed,
+        num_replicates=len(patches),
+    )
+
+
+def patch_dataframe(gw_model: GuineaWormModel, patches: list[int]) -> pd.DataFrame:
+    patch_data = process_data(gw_model.model.results).rename(columns={"replicate": "patch"})
+    patch_data["patch"] = patches[patch_data["patch"].to_numpy()]
+    return patch_data
+
+
+def _run_partition(connection, sink_info, host_info, model_info, patches, patch_parameters, seed):
+    try:
+        gw_model = build_patch_model(sink_info, host_info, model_info, patches, patch_parameters, seed)
+        gw_model.model.patch_exchange = PipeExchange(connection)
+        model_finished = False
+        while not(model_finished):
+            model_finished = gw_model.model.iterateModel()
+        connection.send(("results", patch_dataframe(gw_model, patches)))
+    except Exception:
+        connection.send(("error", traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+def run_metapopulation(
+    sink_info: list[dict],
+    host_info: list[dict],
+    model_info: dict,
+    connectivity: list[list[float]],
+    patch_parameters: dict[str, list[float]] = None,
+    seed: int | np.random.SeedSequence = None,
+    num_partitions: int = 1,
+) -> pd.DataFrame:
+    # With num_partitions > 1 the patches are split over that many processes. Each
+    # step, the coordinator gathers every partition's larvae injested and emergences
+    # per sink, couples them over the whole network and sends back each partition's
+    # share. Every partition draws from its own RNG stream, so results depend on
+    # the partitioning.
+    connectivity = Connectivity(connectivity)
+    num_patches = connectivity.connectivity.shape[0]
+    patch_parameters = {} if patch_parameters is None else patch_parameters
+    partitions = partition_patches(num_patches, num_partitions)
+    partition_seeds = seed_sequence(seed).spawn(num_partitions)
+
+    if num_partitions == 1:
+        gw_model = build_patch_model(sink_info, host_info, model_info, partitions[0], patch_parameters, partition_seeds[0])
+        gw_model.model.patch_exchange = connectivity
+        model_finished = False
+        while not(model_finished):
+            model_finished = gw_model.model.iterateModel()
+        return patch_dataframe(gw_model, partitions[0])
+
+    # Skipping ahead is decided from each partition's own patches, which would
+    # put the partitions out of step with each other
+    if model_info.get("adaptive_timestep") or model_info.get("stop_on_elimination"):
+        raise ValueError("adaptive_timestep and stop_on_elimination are not supported with num_partitions > 1")
+
+    connections = []
+    processes = []
+    for patches, partition_seed in zip(partitions, partition_seeds):
+        connection, worker_connection = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=_run_partition,
+            args=(worker_connection, sink_info, host_info, model_info, patches, patch_parameters, partition_seed)
+        )
+        process.start()
+        worker_connection.close()
+        connections.append(connection)
+        processes.append(process)
+
+    try:
+        while True:
+            messages = [connection.recv() for connection in connections]
+            kinds = {kind for kind, _ in messages}
+            if "error" in kinds:
+                raise RuntimeError(
+                    "A metapopulation partition failed:\n" +
+                    "\n".join(message for kind, message in messages if kind == "error")
+                )
+            if kinds == {"results"}:
+                return pd.concat([partition_data for _, partition_data in messages], ignore_index=True)
+            if len(kinds) > 1:
+                raise RuntimeError(f"Metapopulation partitions are out of step, got {sorted(kinds)}")
+
+            network_values = {
+                sink_name: np.concatenate([values[sink_name] for _, values in messages])
+                for sink_name in messages[0][1]
+            }
+            if kinds == {"larvae"}:
+                coupled = connectivity.couple_larvae(network_values)
+            else:
+                coupled = connectivity.couple_emergences(network_values)
+            for connection, patches in zip(connections, partitions):
+                connection.send({sink_name: values[patches] for sink_name, values in coupled.items()})
+    finally:
+        for connection in connections:
+            connection.close()
+        for process in processes:
+            process.join()
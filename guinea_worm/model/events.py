@@ -0,0 +1,44 @@
+from typing import Callable, NamedTuple
+import numpy as np
+
+
+# Events a Model passes to its observers. They only carry references to numbers the
+# model already has; formatting is up to the observer.
+
+class ProgressEvent(NamedTuple):
+    # Emitted as the model starts the step at time
+    time: int
+    year: float
+    endtime: int
+
+
+class MetricsEvent(NamedTuple):
+    # Emitted for every record written to the results. values is a view of the
+    # record in ModelResults.values (series x replicates), in the order of series.
+    time: int
+    year: float
+    record: int
+    series: list[tuple[str, str]]
+    values: list[list[float]]
+
+
+class FinishedEvent(NamedTuple):
+    time: int
+    year: float
+
+
+ModelEvent = ProgressEvent | MetricsEvent | FinishedEvent
+Observer = Callable[[ModelEvent], None]
+
+
+class PrintObserver:
+    # What Model(verbose=True) prints: the year at each year boundary, the recorded
+    # measures averaged over replicates at each year boundary, and the end of the run
+    def __call__(self, event: ModelEvent):
+        if isinstance(event, ProgressEvent) and float(event.year).is_integer():
+            print(f"Starting iteration for year {event.year}")
+        elif isinstance(event, MetricsEvent) and float(event.year).is_integer():
+            for (population, measure), value in zip(event.series, event.values):
+                print(f"{population} {measure}: {np.mean(value)}")
+        elif isinstance(event, FinishedEvent):
+            print(f"Finished. Time: {event.time} days ({event.year} years)")
@@ -0,0 +1,54 @@
+from abc import ABC, abstractmethod
+import numpy as np
+
+
+class PatchExchange(ABC):
+    # Couples the patches of a metapopulation, which are laid out along the
+    # replicate axis of a model. Hosts of patch i draw water from the sinks of
+    # patch j with weight connectivity[i, j], and the worms emerging from them
+    # are shed into those sinks with the same weights. Called once per step with
+    # the per-patch larvae injested and emergences of every sink.
+    @abstractmethod
+    def couple_larvae(self, larvae_injested: dict[str, list[float]]) -> dict[str, list[float]]:
+        ...
+
+    @abstractmethod
+    def couple_emergences(self, emergences: dict[str, list[float]]) -> dict[str, list[float]]:
+        ...
+
+
+class Connectivity(PatchExchange):
+    # patches x patches, each row summing to one. A scipy.sparse matrix works as
+    # well for large, sparsely connected networks.
+    connectivity: list[list[float]]
+
+    def __init__(self, connectivity: list[list[float]]):
+        if not hasattr(connectivity, "tocsr"):
+            connectivity = np.asarray(connectivity, dtype=float)
+        if connectivity.shape[0] != connectivity.shape[1]:
+            raise ValueError(f"connectivity should be a square patches x patches matrix, got shape {connectivity.shape}")
+        if not np.allclose(np.asarray(connectivity.sum(axis=1)).ravel(), 1):
+            raise ValueError("Every row of connectivity should sum to 1")
+        self.connectivity = connectivity
+
+    def couple_larvae(self, larvae_injested: dict[str, list[float]]) -> dict[str, list[float]]:
+        return {sink_name: self.connectivity @ values for sink_name, values in larvae_injested.items()}
+
+    def couple_emergences(self, emergences: dict[str, list[float]]) -> dict[str, list[float]]:
+        return {sink_name: self.connectivity.T @ values for sink_name, values in emergences.items()}
+
+
+class PipeExchange(PatchExchange):
+    # Used by a model simulating one partition of the patches in its own process;
+    # the coordinator on the other end of the connection couples the whole network
+    # (see guinea_worm.metapopulation)
+    def __init__(self, connection):
+        self.connection = connection
+
+    def couple_larvae(self, larvae_injested: dict[str, list[float]]) -> dict[str, list[float]]:
+        self.connection.send(("larvae", larvae_injested))
+        return self.connection.recv()
+
+    def couple_emergences(self, emergences: dict[str, list[float]]) -> dict[str, list[float]]:
+        self.connection.send(("emergences", emergences))
+        return self.connection.recv()
@@ -1,5 +1,7 @@
 from typing import Tuple
+import heapq
 import numpy as np
+from ..constants import INTERVENTIONS
 
 InterventionEvent = Tuple[int, str]
 
@@ -12,6 +14,16 @@ class Intervention:
 
     intervention_event_times: list[int]
 
+    # Host (tethering) or sink (abate, water_treatment) population the
+    # intervention acts on, all of the matching populations when None
+    target_population: str
+    # Fraction of eligible hosts reached by each tethering event
+    coverage: float
+    # Fraction of the interaction, infected copepods or injestion removed
+    efficacy: float
+    # How long a tethering or water_treatment event lasts, until end_time when None
+    duration: int
+
     def __init__(
         self,
         intervention_name: str,
@@ -19,11 +31,23 @@ class Intervention:
         end_time: int,
         intervention_interval=None,
         intervention_event_times: list[int] = [],
+        target_population: str = None,
+        coverage: float = 1.0,
+        efficacy: float = 1.0,
+        duration: int = None,
     ):
         self.start_time = start_time
         self.end_time = end_time
         self.intervention_name = intervention_name
+        self.target_population = target_population
+        self.coverage = coverage
+        self.efficacy = efficacy
+        self.duration = duration
 
+        if intervention_name not in INTERVENTIONS:
+            raise ValueError(
+                f"intervention_name should be one of {INTERVENTIONS}, got {intervention_name}"
+            )
         if (intervention_interval == None) and (len(intervention_event_times) == 0):
             raise ValueError(
                 "One of intervention_interval or intervention_event_times should be defined"
@@ -34,3 +58,96 @@ class Intervention:
             )
         else:
             self.intervention_event_times = intervention_event_times
+
+    def release_time(self, event_time: int) -> int:
+        if self.duration is None:
+            return self.end_time
+        return event_time + self.duration
+
+
+def _target_populations(populations: dict, intervention: Intervention) -> list:
+    if intervention.target_population is None:
+        return list(populations.values())
+    return [populations[intervention.target_population]]
+
+
+def tether_hosts(model, intervention: Intervention, event_time: int):
+    # Tethering reaches hosts with female worms, the ones that could shed larvae,
+    # and cuts their contact with every sink until the tether is released
+    for host_population in _target_populations(model.host_populations, intervention):
+        candidates = np.flatnonzero(host_population.worm_pop.get_female_worm_burden() > 0)
+        tethered = candidates[model.rng.random(len(candidates)) < intervention.coverage]
+        host_population.sink_interaction[tethered] = (
+            host_population.base_sink_interaction[tethered] * (1 - intervention.efficacy)
+        )
+        host_population.tethered_until[tethered] = intervention.release_time(event_time)
+
+
+def release_tethered_hosts(model, intervention: Intervention, event_time: int):
+    for host_population in _target_populations(model.host_populations, intervention):
+        released = np.flatnonzero(
+            (host_population.tethered_until > 0) & (host_population.tethered_until <= event_time)
+        )
+        host_population.sink_interaction[released] = host_population.base_sink_interaction[released]
+        host_population.tethered_until[released] = 0
+
+
+def abate_sinks(model, intervention: Intervention, event_time: int):
+    for sink_population in _target_populations(model.sink_populations, intervention):
+        sink_population.proportion_infected *= (1 - intervention.efficacy)
+
+
+def treat_water(model, intervention: Intervention, event_time: int):
+    for sink_population in _target_populations(model.sink_populations, intervention):
+        sink_population.treatment_factor = 1 - intervention.efficacy
+        sink_population.treated_until = max(sink_population.treated_until, intervention.release_time(event_time))
+
+
+def end_water_treatment(model, intervention: Intervention, event_time: int):
+    # A treatment still running from a later event keeps the sink treated
+    for sink_population in _target_populations(model.sink_populations, intervention):
+        if 0 < sink_population.treated_until <= event_time:
+            sink_population.treatment_factor = 1.0
+            sink_population.treated_until = 0
+
+
+# intervention_name -> (action at each event time, action when the event's effect ends)
+INTERVENTION_ACTIONS = {
+    "tethering": (tether_hosts, release_tethered_hosts),
+    "abate": (abate_sinks, None),
+    "water_treatment": (treat_water, end_water_treatment),
+}
+
+
+class InterventionScheduler:
+    # Min-heap of (time, sequence, is_release, intervention index); sequence
+    # keeps events at the same time in the order they were scheduled
+    events: list[tuple[int, int, bool, int]]
+    interventions: list[Intervention]
+
+    def __init__(self, interventions: list[Intervention], start_time: int = 0):
+        self.interventions = list(interventions)
+        self.events = []
+        for index, intervention in enumerate(self.interventions):
+            for event_time in intervention.intervention_event_times:
+                self.events.append((int(event_time), len(self.events), False, index))
+                if INTERVENTION_ACTIONS[intervention.intervention_name][1] is not None:
+                    self.events.append((int(intervention.release_time(event_time)), len(self.events), True, index))
+        # Events before start_time already happened, e.g. before a checkpoint was saved
+        self.events = [event for event in self.events if event[0] >= start_time]
+        heapq.heapify(self.events)
+
+    def next_event_time(self) -> int:
+        if len(self.events) == 0:
+            return None
+        return self.events[0][0]
+
+    def apply_due_events(self, model, time: int) -> list[InterventionEvent]:
+        applied = []
+        while len(self.events) > 0 and self.events[0][0] <= time:
+            event_time, _, is_release, index = heapq.heappop(self.events)
+            intervention = self.interventions[index]
+            action = INTERVENTION_ACTIONS[intervention.intervention_name][1 if is_release else 0]
+            action(model, intervention, event_time)
+            applied.append((event_time, intervention.intervention_name))
+        return applied
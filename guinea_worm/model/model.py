@@ -1,146 +1,523 @@
-from .intervention import Intervention, InterventionEvent
+from .exchange import PatchExchange
+from .events import FinishedEvent, MetricsEvent, ModelEvent, Observer, PrintObserver, ProgressEvent
+from .profiling import CountingGenerator, ModelProfiler, NOT_PROFILING
+from .intervention import Intervention, InterventionEvent, InterventionScheduler
 from .population import HostPopulation, SinkPopulation
+from .results import ModelResults
+from .state import prefix_state, unprefix_state
+from ..constants import HOST_MEASURES, SINK_MEASURES, REPORTED_MEASURES
+import json
 import numpy as np
 
 
 class Model:
     time: int
+    start_time: int
     timestep: int
     endtime: int
     _days_in_year: int = 360
     host_populations: dict[str, HostPopulation]
     sink_populations: dict[str, SinkPopulation]
     interventions: dict[InterventionEvent, Intervention]
-    r0: float
-    transmission_asymmetry: float
+    intervention_scheduler: InterventionScheduler
+    # r0, transmission_asymmetry, NcNd and NdNc hold one value per replicate so
+    # that each replicate can simulate a different parameter point
+    r0: list[float]
+    transmission_asymmetry: list[float]
     verbose: bool
-    emergence_events: dict[str, dict[str, int]]
-    NdNc: float
-    NcNd: float
+    emergence_events: dict[str, dict[str, list[int]]]
+    NdNc: list[float]
+    NcNd: list[float]
+    rng: np.random.Generator
+    num_replicates: int
+    results: ModelResults
+    # With adaptive_timestep, stretches where no host carries worms and every sink's
+    # proportion_infected is below quiescence_threshold are crossed without simulating
+    # worms or exposure, up to max_timestep at a time
+    adaptive_timestep: bool
+    max_timestep: int
+    quiescence_threshold: float
+    # With stop_on_elimination, the run stops simulating once no host carries worms
+    # and the new worms still expected from the decaying infected copepods, summed
+    # over all remaining steps, fall to recrudescence_threshold or below; the rest
+    # of the records are then filled in from the sinks' larval decay
+    stop_on_elimination: bool
+    recrudescence_threshold: float
+    # Stats are recorded every reporting_interval days from the start time, a
+    # multiple of timestep, and only for the measures listed (all of
+    # REPORTED_MEASURES when None). Emergences keep accumulating between records.
+    # The final record is always written.
+    reporting_interval: int
+    measures: list[str]
+    # Set when the replicates are the patches of a metapopulation, see PatchExchange
+    patch_exchange: PatchExchange
+    # Set by enable_profiling
+    profiler: ModelProfiler
+    # Called with every ModelEvent; verbose adds a PrintObserver
+    observers: list[Observer]
 
     def __init__(
         self,
         time: int,
         timestep: int,
         endtime: int,
-        r0: float,
-        transmission_asymmetry: float,
-        NcNd: float,
+        r0: float | list[float],
+        transmission_asymmetry: float | list[float],
+        NcNd: float | list[float],
         host_populations: dict[str, HostPopulation],
         sink_populations: dict[str, SinkPopulation],
-        interventions: dict[InterventionEvent, Intervention] = None,
+        interventions: dict[InterventionEvent, Intervention] | list[Intervention] = None,
         verbose: bool = False,
+        rng: np.random.Generator = None,
+        num_replicates: int = 1,
+        adaptive_timestep: bool = False,
+        max_timestep: int = 360,
+        quiescence_threshold: float = 1e-6,
+        stop_on_elimination: bool = False,
+        recrudescence_threshold: float = 0.01,
+        reporting_interval: int = None,
+        measures: list[str] = None,
+        patch_exchange: PatchExchange = None,
     ):
         self.time = time
+        self.start_time = time
         self.timestep = timestep
         self.endtime = endtime
-        self.r0 = r0
-        self.transmission_asymmetry = transmission_asymmetry
-        self.NcNd = NcNd
-        self.NdNc = 1 / NcNd
+        self.r0 = np.full(num_replicates, r0, dtype=float)
+        self.transmission_asymmetry = np.full(num_replicates, transmission_asymmetry, dtype=float)
+        self.NcNd = np.full(num_replicates, NcNd, dtype=float)
+        self.NdNc = 1 / self.NcNd
         self.host_populations = host_populations
         self.sink_populations = sink_populations
-        if interventions is not None:
-            self.interventions = interventions
+        self.set_interventions(interventions)
         self.verbose = verbose
-        self.emergence_events = {}
+        self.observers = [PrintObserver()] if verbose else []
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.num_replicates = num_replicates
+        self.emergence_events = {
+            host_population_name: {sink_name: np.zeros(num_replicates) for sink_name in host_population.sink_name_order}
+            for host_population_name, host_population in host_populations.items()
+        }
+        self.adaptive_timestep = adaptive_timestep
+        self.max_timestep = max_timestep
+        self.quiescence_threshold = quiescence_threshold
+        self.stop_on_elimination = stop_on_elimination
+        self.recrudescence_threshold = recrudescence_threshold
+        self.reporting_interval = timestep if reporting_interval is None else reporting_interval
+        if self.reporting_interval <= 0 or self.reporting_interval % timestep != 0:
+            raise ValueError(
+                f"reporting_interval should be a positive multiple of timestep ({timestep}), got {reporting_interval}"
+            )
+        self.patch_exchange = patch_exchange
+        self.profiler = None
+        self.measures = list(REPORTED_MEASURES) if measures is None else list(measures)
+        unknown_measures = set(self.measures) - set(REPORTED_MEASURES)
+        if len(unknown_measures) > 0:
+            raise ValueError(f"measures should be among {REPORTED_MEASURES}, got {sorted(unknown_measures)}")
+        self.results = ModelResults(
+            self.result_series(),
+            num_replicates=num_replicates,
+            # one record per report plus the final record once past endtime
+            expected_records=(endtime - time) // self.reporting_interval + 2
+        )
+
+    def set_interventions(self, interventions: dict[InterventionEvent, Intervention] | list[Intervention]):
+        if interventions is None:
+            interventions = []
+        self.interventions = interventions
+        if isinstance(interventions, dict):
+            interventions = interventions.values()
+        self.intervention_scheduler = InterventionScheduler(interventions, start_time=self.time)
+
+    def set_rng(self, rng: np.random.Generator):
+        if self.profiler is not None and not isinstance(rng, CountingGenerator):
+            rng = CountingGenerator(rng, self.profiler)
+        self.rng = rng
+        for host_population in self.host_populations.values():
+            host_population.set_rng(rng)
+
+    def enable_profiling(self, track_memory: bool = False) -> ModelProfiler:
+        # Times each phase of iterateModel and counts the random numbers drawn in
+        # it, until disable_profiling. The generator is wrapped to count draws.
+        self.profiler = ModelProfiler(track_memory=track_memory)
+        self.set_rng(self.rng)
+        return self.profiler
+
+    def disable_profiling(self) -> dict:
+        report = self.profiler.report()
+        self.profiler.close()
+        self.profiler = None
+        self.set_rng(self.rng.generator)
+        return report
+
+    def add_observer(self, observer: Observer):
+        self.observers.append(observer)
+
+    def remove_observer(self, observer: Observer):
+        self.observers.remove(observer)
+
+    def emit(self, event: ModelEvent):
+        for observer in self.observers:
+            observer(event)
+
+    def phase(self, name: str):
+        if self.profiler is None:
+            return NOT_PROFILING
+        return self.profiler.phase(name)
+
+    def reset(self, infectivity_rate: float | list[float] = None):
+        # Rewinds to start_time with the populations back in their initial state,
+        # keeping every allocated array. Parameters and the generator are left as
+        # they are; see set_parameters and set_rng.
+        self.time = self.start_time
+        for host_population in self.host_populations.values():
+            host_population.reset()
+        for sink_population in self.sink_populations.values():
+            sink_population.reset(infectivity_rate)
+        for sink_events in self.emergence_events.values():
+            for value in sink_events.values():
+                value.fill(0)
+        self.results.reset()
+        self.set_interventions(self.interventions)
+
+    def set_parameters(
+        self,
+        r0: float | list[float] = None,
+        transmission_asymmetry: float | list[float] = None,
+        NcNd: float | list[float] = None,
+    ):
+        if r0 is not None:
+            self.r0 = np.full(self.num_replicates, r0, dtype=float)
+        if transmission_asymmetry is not None:
+            self.transmission_asymmetry = np.full(self.num_replicates, transmission_asymmetry, dtype=float)
+        if NcNd is not None:
+            self.NcNd = np.full(self.num_replicates, NcNd, dtype=float)
+            self.NdNc = 1 / self.NcNd
+        for sink_population in self.sink_populations.values():
+            sink_population.r0_worm_to_sink = self.r0 ** self.transmission_asymmetry
+
+    def result_series(self) -> list[tuple[str, str]]:
+        series = []
+        for host_population_name, host_population in self.host_populations.items():
+            series += [(host_population_name, measure) for measure in HOST_MEASURES if measure in self.measures]
+            if "emergence" in self.measures:
+                series += [(host_population_name, f"emergence_{sink_name}") for sink_name in host_population.sink_name_order]
+            if "Re" in self.measures:
+                series += [(host_population_name, f"Re_{sink_name}") for sink_name in host_population.sink_name_order]
+        for sink_name in self.sink_populations:
+            series += [(sink_name, measure) for measure in SINK_MEASURES if measure in self.measures]
+        return series
+
+    def infection_rate_factor(self, host_population: HostPopulation, sink_population: SinkPopulation) -> list[float]:
+        # Expected new worms per replicate for a host that interacts with the sink,
+        # per unit of larvae injested
+        return (
+            (self.r0 ** (1 - self.transmission_asymmetry)) *
+            (
+                sink_population.mortality_rate * 
+                (
+                    (host_population.mortality_rate + host_population.worm_pop.worm_death_rate) / 
+                    host_population.worm_pop.worm_death_rate)
+            ) *
+            self.NcNd *
+            self.timestep /
+            host_population.worm_pop.sex_ratio
+        )
 
     def check_for_exposure_event(self):
+        # One pass per host population over all of its sinks at once. Arrays with a
+        # sink axis are ordered by the host population's sink_name_order.
+        larvae_injested = {
+            sink_name: sink_population.larvae_injested()
+            for sink_name, sink_population in self.sink_populations.items()
+        }
+        if self.patch_exchange is not None:
+            larvae_injested = self.patch_exchange.couple_larvae(larvae_injested)
+        sink_emergences = {sink_name: np.zeros(self.num_replicates) for sink_name in self.sink_populations}
+
         for host_population_name in self.host_populations:
             host_population = self.host_populations[host_population_name]
+            interactions = host_population.sink_interaction
+            interaction_occurred = self.rng.random(interactions.shape) < interactions
+
+            # Infection Event
+            # Expected new worms for a host of each replicate that interacts with each
+            # sink, computed once per step. Dimensions: replicates x sinks
+            infection_pressure = np.stack([
+                self.infection_rate_factor(host_population, self.sink_populations[sink_name]) *
+                larvae_injested[sink_name]
+                for sink_name in host_population.sink_name_order
+            ], axis=1)
+            # Only hosts that drew water from a sink can take in worms. The worms
+            # injested from every sink a host drew water from add up to a single
+            # Poisson count, and only hosts that took in worms have them split by sex.
+            if interactions.shape[1] == 1:
+                exposed = np.flatnonzero(interaction_occurred[:, 0])
+            else:
+                exposed = np.flatnonzero(interaction_occurred.any(axis=1))
+            # exposed is sorted, so each replicate's hosts are a contiguous run
+            exposed_per_replicate = np.diff(np.searchsorted(
+                exposed, np.arange(self.num_replicates + 1) * host_population.num_individuals
+            ))
+            exposed_pressure = np.repeat(infection_pressure, exposed_per_replicate, axis=0)
+            if interactions.shape[1] == 1:
+                rate_of_infection_in = exposed_pressure[:, 0]
+            else:
+                rate_of_infection_in = np.sum(interaction_occurred[exposed] * exposed_pressure, axis=1)
+            new_worms_in = self.rng.poisson(lam=rate_of_infection_in)
+            infected = np.flatnonzero(new_worms_in)
+            new_worms_in = new_worms_in[infected]
+            new_male_worms = self.rng.binomial(new_worms_in, host_population.worm_pop.sex_ratio)
+            host_population.worm_pop.injest_worms(
+                exposed[infected], new_male_worms, new_worms_in - new_male_worms
+            )
+
+            # Emergance Event
+            num_worms_emerging = host_population.worms_emerging(
+                interaction_occurred
+            )
             for index, sink_name in enumerate(host_population.sink_name_order):
-                interactions = host_population.sink_interaction[:, index]
-                interaction_occurred = np.random.rand(len(interactions)) < interactions
+                sink_emergences[sink_name] += num_worms_emerging[:, index]
+                self.emergence_events[host_population_name][sink_name] += num_worms_emerging[:, index]
 
-                # Infection Event
-                rate_of_infection_in = np.where(
-                    interaction_occurred,
-                    #host_population.exposure_heterogeneity *
-                    (self.r0 ** (1 - self.transmission_asymmetry)) *
-                    self.sink_populations[sink_name].larvae_injested(interaction_occurred) *
-                    (
-                        self.sink_populations[sink_name].mortality_rate * 
-                        (
-                            (host_population.mortality_rate + host_population.worm_pop.worm_death_rate) / 
-                            host_population.worm_pop.worm_death_rate)
-                    ) *
-                    self.NcNd *
-                    self.timestep /
-                    host_population.worm_pop.sex_ratio,
-                    0.0
-                )
+        if self.patch_exchange is not None:
+            sink_emergences = self.patch_exchange.couple_emergences(sink_emergences)
+        for sink_name, sink_population in self.sink_populations.items():
+            sink_population.add_infectivity_boost(sink_emergences[sink_name])
 
-                #rate_of_infection_in += np.sum(host_population.worm_pop.get_total_worms()) / host_population.num_individuals
-                
-                new_worms_in = np.random.poisson(
-                    lam=rate_of_infection_in
-                )
+    def iterateModel(self):
+        if self.profiler is not None:
+            self.profiler.steps += 1
+        if self.time > self.endtime:
+            with self.phase("stats"):
+                self.printPopulationStats()
+            if self.observers:
+                self.emit(FinishedEvent(self.time, self.time / self._days_in_year))
+            return True
 
-                # new_worms_in = 1 + (1 - rate_of_infection_in)
-                host_population.worm_pop.new_worms_injested(
-                    new_worms_in
-                )
+        if self.observers:
+            self.emit(ProgressEvent(self.time, self.time / self._days_in_year, self.endtime))
+
+        with self.phase("interventions"):
+            self.intervention_scheduler.apply_due_events(self, self.time)
+
+        if self.stop_on_elimination:
+            with self.phase("skip"):
+                if self.is_eliminated():
+                    self.fast_forward_to_end()
+                    return False
+
+        if self.adaptive_timestep:
+            with self.phase("skip"):
+                if self.is_quiescent():
+                    self.skip_quiescent_steps()
+                    return False
 
-                # Emergance Event
-                if (host_population_name not in self.emergence_events) or (sink_name not in self.emergence_events[host_population_name]):
-                    self.emergence_events[host_population_name] = {sink_name: 0}
-                num_worms_emerging = host_population.worms_emerging(
-                    interaction_occurred
+        with self.phase("host_age"):
+            for population_name in self.host_populations:
+                population = self.host_populations[population_name]
+                population.age(timestep=self.timestep)
+
+        with self.phase("sink_age"):
+            for population_name in self.sink_populations:
+                population = self.sink_populations[population_name]
+                population.age(timestep=self.timestep, NdNc=self.NdNc)
+        with self.phase("exposure"):
+            self.check_for_exposure_event()
+
+        if self.is_report_time():
+            with self.phase("stats"):
+                self.printPopulationStats()
+        self.time += self.timestep
+        return False
+
+    def is_quiescent(self) -> bool:
+        for sink_population in self.sink_populations.values():
+            if (sink_population.get_proportion_infected() >= self.quiescence_threshold).any() or sink_population.num_emergences.any():
+                return False
+        for host_population in self.host_populations.values():
+            if host_population.has_worms():
+                return False
+        return True
+
+    def expected_recrudescence(self) -> list[float]:
+        # Upper bound, per replicate, on the new worms injested from now on if no worm
+        # emerges again: every later step sees proportion_infected shrunk by the sink's
+        # decay factor once more, a geometric series. Tethering and water treatment
+        # are left out since either can be lifted before the end of the run.
+        expected_worms = np.zeros(self.num_replicates)
+        for host_population in self.host_populations.values():
+            interactions = np.sum(
+                np.reshape(
+                    host_population.base_sink_interaction,
+                    (self.num_replicates, host_population.num_individuals, -1)
+                ),
+                axis=1
+            )
+            for index, sink_name in enumerate(host_population.sink_name_order):
+                sink_population = self.sink_populations[sink_name]
+                decay = sink_population.decay_factor(self.timestep)
+                future_proportion = (
+                    np.inf if decay >= 1 else decay / (1 - decay)
+                ) * sink_population.get_proportion_infected()
+                expected_worms += np.nan_to_num(
+                    self.infection_rate_factor(host_population, sink_population) *
+                    future_proportion *
+                    interactions[:, index],
+                    nan=0.0
                 )
-                self.sink_populations[sink_name].add_infectivity_boost(num_worms_emerging)
-                self.emergence_events[host_population_name][sink_name] += num_worms_emerging
+        return expected_worms
 
-    def iterateModel(self):
-        if self.time > self.endtime:
-            if self.verbose:
-                print(f"Finished. Time: {self.time} days ({self.time / self._days_in_year} years)")
-            return True, {
-                "year": (self.time / self._days_in_year),
-                "stats": self.printPopulationStats(self.verbose)
-            }
-
-        for population_name in self.host_populations:
-            population = self.host_populations[population_name]
-            population.age(timestep=self.timestep)
-
-        for population_name in self.sink_populations:
-            population = self.sink_populations[population_name]
-            population.age(timestep=self.timestep, NdNc=self.NdNc)
-        self.check_for_exposure_event()
-
-        return_stats = {}
-        print_summary = False
-        if self.time % self._days_in_year == 0:
-            if self.verbose:
-                print(f"Starting iteration for year {self.time / self._days_in_year}")
-                print_summary = True
-        return_stats = {
-            "year": (self.time / self._days_in_year),
-            "stats": self.printPopulationStats(print_summary)
+    def is_eliminated(self) -> bool:
+        for sink_population in self.sink_populations.values():
+            if sink_population.num_emergences.any():
+                return False
+        for host_population in self.host_populations.values():
+            if host_population.has_worms():
+                return False
+        return bool((self.expected_recrudescence() <= self.recrudescence_threshold).all())
+
+    def fast_forward_to_end(self):
+        # Fills every remaining record up to endtime without simulating: hosts stay
+        # worm free and each sink's proportion_infected decays as sink.age would
+        # leave it. Host demography is not advanced any further. Stops at the next
+        # intervention event instead, so iterateModel applies it and carries on.
+        fast_forward_end = self.endtime + 1
+        next_event_time = self.intervention_scheduler.next_event_time()
+        if next_event_time is not None:
+            fast_forward_end = min(fast_forward_end, next_event_time)
+        num_steps = max(1, -(-(fast_forward_end - self.time) // self.timestep))
+        steps = np.arange(1, num_steps + 1)[:, np.newaxis]
+        proportions_infected = {
+            sink_name: sink_population.get_proportion_infected() * sink_population.decay_factor(self.timestep) ** steps
+            for sink_name, sink_population in self.sink_populations.items()
         }
-        self.time += self.timestep
-        return False, return_stats
+        for step in range(num_steps):
+            if self.is_report_time():
+                for sink_name, sink_population in self.sink_populations.items():
+                    sink_population.proportion_infected = proportions_infected[sink_name][step]
+                self.printPopulationStats(hosts_have_worms=False)
+            self.time += self.timestep
+        for sink_name, sink_population in self.sink_populations.items():
+            sink_population.proportion_infected = proportions_infected[sink_name][-1]
+
+    def skip_quiescent_steps(self):
+        # Jump to the next intervention event, the end of the run or max_timestep,
+        # whichever comes first. Only host turnover and the sinks' larval decay are
+        # advanced step by step; worms are absent and infection pressure is negligible.
+        jump_end = min(self.time + self.max_timestep, self.endtime + 1)
+        next_event_time = self.intervention_scheduler.next_event_time()
+        if next_event_time is not None:
+            jump_end = min(jump_end, next_event_time)
+        num_steps = max(1, -(-(jump_end - self.time) // self.timestep))
+
+        for host_population in self.host_populations.values():
+            for _ in range(num_steps):
+                host_population.turnover(self.timestep)
+            host_population.worm_pop.age(num_steps * self.timestep)
+
+        for _ in range(num_steps):
+            for sink_population in self.sink_populations.values():
+                sink_population.age(timestep=self.timestep, NdNc=self.NdNc)
+            if self.is_report_time():
+                self.printPopulationStats(hosts_have_worms=False)
+            self.time += self.timestep
 
-    def printPopulationStats(self, print_summary: bool):
-        population_stats = {}
+    def is_report_time(self) -> bool:
+        return (self.time - self.start_time) % self.reporting_interval == 0
+
+    def printPopulationStats(self, hosts_have_worms: bool = True) -> int:
+        # Writes the current stats straight into self.results as a new record
+        record = self.results.new_record(self.time / self._days_in_year)
+        host_stat_names = [stat_name for measure, stat_name in HOST_MEASURES.items() if measure in self.measures]
         for host_population_name in self.host_populations:
             host_population = self.host_populations[host_population_name]
-            population_stats[host_population_name] = host_population.stats(verbose=print_summary)
+            if len(host_stat_names) == 0:
+                host_stats = {}
+            elif hosts_have_worms:
+                host_stats = host_population.stats(stat_names=host_stat_names)
+            else:
+                host_stats = host_population.empty_stats()
+            for measure, stat_name in HOST_MEASURES.items():
+                if measure in self.measures:
+                    self.results.record(record, host_population_name, measure, host_stats[stat_name])
 
             for sink_name, value in self.emergence_events[host_population_name].items():
-                population_stats[host_population_name][f"emergence_{sink_name}"] = value
-                self.emergence_events[host_population_name][sink_name] = 0
-                population_stats[host_population_name]["Re"] = (
+                if "emergence" in self.measures:
+                    self.results.record(record, host_population_name, f"emergence_{sink_name}", value)
+                self.emergence_events[host_population_name][sink_name] = np.zeros(self.num_replicates)
+                if "Re" not in self.measures:
+                    continue
+                self.results.record(record, host_population_name, f"Re_{sink_name}", (
                     (self.r0 ** (1 - self.transmission_asymmetry)) *
                     (self.r0 ** self.transmission_asymmetry) *
                     # proportion of all female worms that are classified as possibly "fertile"?
                     #host_population.worm_pop.get_mating_probability() *
                     (1-self.sink_populations[sink_name].get_proportion_infected())
-                )
+                ))
 
         for sink_name in self.sink_populations:
-            population_stats[sink_name] = self.sink_populations[sink_name].stats(verbose=print_summary)
-        return population_stats
+            sink_stats = self.sink_populations[sink_name].stats()
+            for measure, stat_name in SINK_MEASURES.items():
+                if measure in self.measures:
+                    self.results.record(record, sink_name, measure, sink_stats[stat_name])
+        if self.observers:
+            self.emit(MetricsEvent(
+                self.time, self.time / self._days_in_year, record,
+                list(zip(self.results.series_populations, self.results.series_measures)),
+                self.results.values[record]
+            ))
+        return record
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        state = {
+            "time": np.asarray(self.time),
+            "rng_state": np.asarray(json.dumps(self.rng.bit_generator.state)),
+        }
+        for host_population_name, sink_events in self.emergence_events.items():
+            for sink_name, value in sink_events.items():
+                state[f"emergence__{host_population_name}__{sink_name}"] = np.asarray(value)
+        for host_population_name, host_population in self.host_populations.items():
+            state.update(prefix_state(f"host__{host_population_name}", host_population.get_state()))
+        for sink_name, sink_population in self.sink_populations.items():
+            state.update(prefix_state(f"sink__{sink_name}", sink_population.get_state()))
+        state.update(prefix_state("results", self.results.get_state()))
+        return state
+
+    def set_state(self, state: dict[str, np.ndarray]):
+        self.time = int(state["time"])
+        # The generator is shared with the populations, so restoring it here restores theirs
+        self.rng.bit_generator.state = json.loads(str(state["rng_state"]))
+        self.emergence_events = {}
+        for name in state:
+            if name.startswith("emergence__"):
+                host_population_name, sink_name = name[len("emergence__"):].split("__", 1)
+                self.emergence_events.setdefault(host_population_name, {})[sink_name] = np.array(state[name])
+        for host_population_name, host_population in self.host_populations.items():
+            host_population.set_state(unprefix_state(f"host__{host_population_name}", state))
+        for sink_name, sink_population in self.sink_populations.items():
+            sink_population.set_state(unprefix_state(f"sink__{sink_name}", state))
+        self.results.set_state(unprefix_state("results", state))
+        # Effects of earlier interventions are part of the population state; only
+        # the events still to come are rescheduled
+        self.set_interventions(self.interventions)
+
+    def memory_footprint(self) -> dict[str, int]:
+        # Bytes of array storage held by each population and by the results
+        footprint = {}
+        for population_name, population in {**self.host_populations, **self.sink_populations}.items():
+            footprint[population_name] = population.memory_footprint()
+        footprint["results"] = self.results.memory_footprint()
+        return footprint
+
+    def save_checkpoint(self, path: str):
+        with open(path, "wb") as checkpoint_file:
+            np.savez_compressed(checkpoint_file, **self.get_state())
+
+    def load_checkpoint(self, path: str):
+        # Restores into a model built from the same configuration as the saved one
+        with np.load(path) as checkpoint:
+            self.set_state({name: checkpoint[name] for name in checkpoint.files})
 
     def setDaysInYear(self, days: int) -> None:
         self._days_in_year = days
@@ -1,72 +1,124 @@
-import math
-from .worms import Worms
+from .worms import BaseWorms, WORM_STORAGE_BACKENDS
+from .state import Stateful, prefix_state, unprefix_state
 import numpy as np
 import random
 
 
-class Population:
+class Population(Stateful):
     num_individuals: int
     population_name: str
     mortality_rate: float
+    # Independent stochastic replicates simulated side by side. Per-individual
+    # arrays hold num_replicates blocks of num_individuals, replicate-major.
+    num_replicates: int
 
-    def __init__(self, num_individuals: int, population_name: str, mortality_rate: float):
+    def __init__(self, num_individuals: int, population_name: str, mortality_rate: float, num_replicates: int = 1):
         self.num_individuals = num_individuals
         self.population_name = population_name
         self.mortality_rate = mortality_rate
+        self.num_replicates = num_replicates
 
 
 class SinkPopulation(Population):
     larvae_injestion_rate: float
-    proportion_infected: float
+    # One entry per replicate
+    proportion_infected: list[float]
     start_infectivity: int
-    r0_worm_to_sink: float
-    num_emergences: int
+    r0_worm_to_sink: list[float]
+    num_emergences: list[int]
     total_host_population: int
+    # Share of the usual larvae injestion that still happens, lowered by water treatment
+    treatment_factor: float
+    # Time the last water treatment wears off, 0 when the sink is not treated
+    treated_until: int
+    # "euler" for the original explicit step, "exact" to solve the linear larval
+    # ODE exactly over each step, which stays stable for long steps
+    integrator: str
+    # proportion_infected at the start of a run
+    initial_infectivity_rate: list[float]
+
+    _state_attributes = ["proportion_infected", "num_emergences", "treatment_factor", "treated_until"]
 
     def __init__(
         self,
         density: float, # copepods per liter
         size: float, # total liters
         population_name: str,
-        r0_worm_to_sink: float,
-        infectivity_rate: float = 0.0001,
-        larval_death_rate: int = 30/360
+        r0_worm_to_sink: float | list[float],
+        infectivity_rate: float | list[float] = 0.0001,
+        larval_death_rate: int = 30/360,
+        num_replicates: int = 1,
+        integrator: str = "euler",
     ):
-        super().__init__(density * size, population_name, larval_death_rate)
-        self.proportion_infected = infectivity_rate
-        self.infective_larvae = math.floor(infectivity_rate * self.num_individuals)
-        self.r0_worm_to_sink = r0_worm_to_sink
-        self.num_emergences = 0
+        super().__init__(density * size, population_name, larval_death_rate, num_replicates)
+        self.initial_infectivity_rate = np.full(num_replicates, infectivity_rate, dtype=float)
+        self.proportion_infected = self.initial_infectivity_rate.copy()
+        self.infective_larvae = np.floor(self.proportion_infected * self.num_individuals)
+        self.r0_worm_to_sink = np.full(num_replicates, r0_worm_to_sink, dtype=float)
+        self.num_emergences = np.zeros(num_replicates)
         self.total_host_population = 0
+        self.treatment_factor = 1.0
+        self.treated_until = 0
+        if integrator not in ["euler", "exact"]:
+            raise ValueError(f"integrator should be one of ['euler', 'exact'], got {integrator}")
+        self.integrator = integrator
         self.mortality_rate = larval_death_rate
 
+    def reset(self, infectivity_rate: float | list[float] = None):
+        # Back to the start of a run, optionally from a new infectivity_rate
+        if infectivity_rate is not None:
+            self.initial_infectivity_rate[:] = infectivity_rate
+        self.proportion_infected[:] = self.initial_infectivity_rate
+        self.num_emergences.fill(0)
+        self.treatment_factor = 1.0
+        self.treated_until = 0
+
     def update_host_population(self, num_individuals: int):
         self.total_host_population += num_individuals
 
-    def larvae_injested(self, infection_interaction: list[bool]) -> list[int]:        
-        infected_sinks_injested_indiv = np.full(
-            len(infection_interaction), 
-            self.get_proportion_infected()
-        )
-        return infected_sinks_injested_indiv
+    def larvae_injested(self) -> list[float]:
+        # Per replicate, for a host that drew water from the sink
+        return self.get_proportion_infected() * self.treatment_factor
     
-    def add_infectivity_boost(self, num_emergences: float):
+    def add_infectivity_boost(self, num_emergences: list[float]):
         self.num_emergences += num_emergences
 
     def update_proportion_infected(self, timestep: int, NdNc: float):
-        # rk4 for diferential equation
-        new_proportion_infected = self.proportion_infected + (
+        # Infection pressure from the worms that emerged during the step
+        infection_in = (
             self.r0_worm_to_sink * 
             (self.num_emergences / self.total_host_population) * 
-            NdNc *
-            (1 - self.proportion_infected)
-        ) - (
-            self.mortality_rate * 
-            self.proportion_infected *
-            timestep
+            NdNc
         )
-        self.proportion_infected = min(max(new_proportion_infected, 0), 1)
-        self.num_emergences = 0
+        if self.integrator == "exact":
+            # dp/dt = a (1 - p) - mortality_rate p with a = infection_in / timestep held
+            # constant over the step is linear, so it relaxes exponentially to its equilibrium
+            total_rate = infection_in / timestep + self.mortality_rate
+            equilibrium = np.divide(
+                infection_in / timestep, total_rate,
+                out=np.zeros(self.num_replicates), where=total_rate > 0
+            )
+            new_proportion_infected = equilibrium + (
+                self.proportion_infected - equilibrium
+            ) * np.exp(-total_rate * timestep)
+        else:
+            # explicit Euler step
+            new_proportion_infected = self.proportion_infected + (
+                infection_in *
+                (1 - self.proportion_infected)
+            ) - (
+                self.mortality_rate * 
+                self.proportion_infected *
+                timestep
+            )
+        self.proportion_infected = np.clip(new_proportion_infected, 0, 1)
+        self.num_emergences = np.zeros(self.num_replicates)
+
+    def decay_factor(self, timestep: int) -> float:
+        # What proportion_infected is multiplied by over a step without emergences
+        if self.integrator == "exact":
+            return np.exp(-self.mortality_rate * timestep)
+        return max(1 - self.mortality_rate * timestep, 0.0)
 
     def get_proportion_infected(self):
         return self.proportion_infected
@@ -74,24 +126,40 @@ class SinkPopulation(Population):
     def age(self, timestep: int, NdNc: float):
         self.update_proportion_infected(timestep, NdNc)
 
-    def stats(self, verbose=False):        
-        if(verbose):
-            print(
-                f"{self.population_name} Infection prevalence: {self.get_proportion_infected()}"
-            )
+    def stats(self):
         return {
             "infective_larvae": self.get_proportion_infected()
         }
             
 
 class HostPopulation(Population):
-    ages: list[int]
-    worm_pop: Worms
+    # Each host's death time is drawn when it is born. Dying with probability
+    # 1 - exp(-mortality_rate * age) at every step of length dt, a host survives
+    # k steps with probability exp(-mortality_rate * dt * k (k + 1) / 2), which is
+    # inverted directly. Hosts are kept in buckets by death time, so a step only
+    # touches the hosts that die in it. Lifetimes are drawn at the first turnover,
+    # once the timestep is known (_timestep is 0 until then).
+    birth_time: list[int]
+    death_time: list[int]
+    _time: int
+    _timestep: int
+    _deaths_by_time: dict[int, list[list[int]]]
+    worm_pop: BaseWorms
     exposure_heterogeneity: list[int]
     ke: float
+    # Hosts of each replicate that start with a pair of worms
+    initial_infected: int
     # Dimensions: Rows are # of individuals columns are sinks, ordered by sink_name_order
     sink_interaction: list[list[int]]
+    # sink_interaction before any tethering, and when each tethered host is released
+    base_sink_interaction: list[list[int]]
+    tethered_until: list[int]
     sink_name_order: list[str]
+    rng: np.random.Generator
+
+    _state_attributes = [
+        "birth_time", "death_time", "_time", "_timestep", "exposure_heterogeneity", "sink_interaction", "tethered_until"
+    ]
 
     def __init__(
         self,
@@ -105,69 +173,179 @@ class HostPopulation(Population):
         sink_interaction_values: dict[str, dict[str, list[int]]],
         worm_maturity_age_days: int,
         max_worm_age: int,
+        worm_storage: str = "dense",
+        rng: np.random.Generator = None,
+        num_replicates: int = 1,
+        worm_dtype: str = "int64",
     ):
-        super().__init__(num_individuals, population_name, mortality_rate)
-        self.worm_pop = Worms(
+        super().__init__(num_individuals, population_name, mortality_rate, num_replicates)
+        self.rng = rng if rng is not None else np.random.default_rng()
+        if worm_storage not in WORM_STORAGE_BACKENDS:
+            raise ValueError(
+                f"worm_storage should be one of {list(WORM_STORAGE_BACKENDS.keys())}, got {worm_storage}"
+            )
+        self.worm_pop = WORM_STORAGE_BACKENDS[worm_storage](
             worm_death_rate=worm_death_rate,
-            individuals=num_individuals,
+            individuals=num_individuals * num_replicates,
             mating_probability=worm_mating_probability,
             worm_maturity_age_days=worm_maturity_age_days,
-            max_worm_age=max_worm_age
+            max_worm_age=max_worm_age,
+            rng=self.rng,
+            worm_dtype=worm_dtype
         )
-        if (initial_infected > 0):
-            self.worm_pop.male_worms[:initial_infected, 0] = 1
-            self.worm_pop.female_worms[:initial_infected, 0] = 1
+        self.initial_infected = initial_infected
+        self.seed_initial_worms()
         self.ke = ke
-        self.exposure_heterogeneity = np.random.gamma(
-            shape=ke, scale=1 / ke, size=num_individuals
+        self.exposure_heterogeneity = self.rng.gamma(
+            shape=ke, scale=1 / ke, size=num_individuals * num_replicates
         )
-        self.ages = np.full(num_individuals, 0)
+        self.birth_time = np.zeros(num_individuals * num_replicates, dtype=np.int64)
+        self.death_time = np.zeros(num_individuals * num_replicates, dtype=np.int64)
+        self._time = 0
+        self._timestep = 0
+        self._deaths_by_time = {}
         self.sink_name_order = list(sink_interaction_values.keys())
-        self.sink_interaction = np.array(
+        self.sink_interaction = np.tile(np.array(
             [sink_interaction_values[key]["interaction"] for key in self.sink_name_order]
-        ).T
+        ).T, (num_replicates, 1))
+        self.base_sink_interaction = self.sink_interaction.copy()
+        self.tethered_until = np.zeros(num_individuals * num_replicates, dtype=np.int64)
+
+    def seed_initial_worms(self):
+        if (self.initial_infected > 0):
+            self.worm_pop.seed_worms(
+                (np.arange(self.num_replicates)[:, np.newaxis] * self.num_individuals + np.arange(self.initial_infected)).ravel()
+            )
 
-    def process_death(self, individuals: list[bool]):
-        self.ages[individuals] = 0
-        self.exposure_heterogeneity[individuals] = np.random.gamma(
-            shape=self.ke, scale=1 / self.ke, size=sum(individuals)
+    def reset(self):
+        # Back to the start of a run in the existing arrays, drawing from the
+        # generator exactly as __init__ does
+        self.worm_pop.reset()
+        self.seed_initial_worms()
+        self.exposure_heterogeneity[:] = self.rng.gamma(
+            shape=self.ke, scale=1 / self.ke, size=len(self.exposure_heterogeneity)
         )
+        self.birth_time.fill(0)
+        self.death_time.fill(0)
+        self._time = 0
+        self._timestep = 0
+        self._deaths_by_time = {}
+        self.sink_interaction[:] = self.base_sink_interaction
+        self.tethered_until.fill(0)
+
+    @property
+    def ages(self) -> list[int]:
+        return self._time - self.birth_time
+
+    def _draw_death_times(self, num_hosts: int) -> list[int]:
+        if self.mortality_rate == 0:
+            return np.full(num_hosts, np.iinfo(np.int64).max)
+        # Steps survived: the smallest k with k (k + 1) / 2 > -log(U) / (mortality_rate * dt)
+        threshold = -np.log1p(-self.rng.random(num_hosts)) / (self.mortality_rate * self._timestep)
+        steps = np.floor((np.sqrt(1 + 8 * threshold) - 1) / 2) + 1
+        return self._time + np.minimum(steps, np.iinfo(np.int64).max // (2 * self._timestep)).astype(np.int64) * self._timestep
+
+    def _schedule_deaths(self, hosts: list[int]):
+        order = np.argsort(self.death_time[hosts], kind="stable")
+        death_times, starts = np.unique(self.death_time[hosts][order], return_index=True)
+        for death_time, dying in zip(death_times, np.split(hosts[order], starts[1:])):
+            self._deaths_by_time.setdefault(int(death_time), []).append(dying)
+
+    def process_death(self, individuals: list[int]):
+        # Every per-host reset of the hosts that died, by index, replaced by newborns
+        self.exposure_heterogeneity[individuals] = self.rng.gamma(
+            shape=self.ke, scale=1 / self.ke, size=len(individuals)
+        )
+        self.birth_time[individuals] = self._time
+        self.sink_interaction[individuals] = self.base_sink_interaction[individuals]
+        self.tethered_until[individuals] = 0
+        # Before the first turnover, every host's death time is drawn there
+        if self._timestep > 0:
+            self.death_time[individuals] = self._draw_death_times(len(individuals))
+            self._schedule_deaths(individuals)
         self.worm_pop.process_host_death(individuals)
 
-    def age(self, timestep: int):
-        self.ages += timestep
+    def turnover(self, timestep: int):
+        if self._timestep == 0:
+            self._timestep = timestep
+            hosts = np.arange(len(self.birth_time))
+            self.death_time[hosts] = self._draw_death_times(len(hosts))
+            self._schedule_deaths(hosts)
+        elif timestep != self._timestep:
+            raise ValueError(f"HostPopulation was aged by {self._timestep} day steps, got a {timestep} day step")
+        self._time += timestep
+
+        dying = self._deaths_by_time.pop(self._time, None)
+        if dying is not None:
+            # In host order, so a population restored with set_state draws the same
+            self.process_death(np.sort(np.concatenate(dying)))
 
-        to_die = np.random.rand(len(self.ages)) < (1 - np.exp(-(self.mortality_rate) * self.ages))
-        self.process_death(to_die)
+    def age(self, timestep: int):
+        self.turnover(timestep)
         self.worm_pop.age(timestep)
 
-    def worms_emerging(self, interaction_occured: list[bool]) -> float:
-        return self.worm_pop.worms_emerging(interaction_occured)
+    def has_worms(self) -> bool:
+        return self.worm_pop.has_worms()
 
-    def stats(self, verbose=False) -> dict[str, int]:
-        total_worm_burden = self.worm_pop.get_total_worms()
-        num_infected_with_worm = np.mean(
-            np.array(total_worm_burden) > 0
-        )
+    def set_rng(self, rng: np.random.Generator):
+        self.rng = rng
+        self.worm_pop.rng = rng
 
-        worm_load_per_person =  np.mean(total_worm_burden)
-        female_worm_burden = np.array(self.worm_pop.get_female_worm_burden())
-        female_worm_load_per_person = np.mean(female_worm_burden)
+    def get_state(self) -> dict[str, np.ndarray]:
+        return {**super().get_state(), **prefix_state("worms", self.worm_pop.get_state())}
 
-        female_worm_prev = np.sum(female_worm_burden > 0) / len(female_worm_burden)
-        
-        if(verbose):
-            print(
-                f"Worm Infection prevalence: {num_infected_with_worm}"
-            )
+    def set_state(self, state: dict[str, np.ndarray]):
+        super().set_state(state)
+        self.worm_pop.set_state(unprefix_state("worms", state))
+        self._deaths_by_time = {}
+        if self._timestep > 0:
+            alive = np.flatnonzero(self.death_time > self._time)
+            self._schedule_deaths(alive)
 
-            print(
-                f"Worms Load per Person: {worm_load_per_person}\nFemale Worm Load per Person: {female_worm_load_per_person}"
-            )
+    def memory_footprint(self) -> int:
+        return super().memory_footprint() + self.worm_pop.memory_footprint()
+
+    def by_replicate(self, values: list) -> list[list]:
+        return np.reshape(values, (self.num_replicates, self.num_individuals))
+
+    def worms_emerging(self, interaction_occured: list[list[bool]]) -> list[list[float]]:
+        # interaction_occured is individuals x sinks. A host's emerging worms go to one
+        # of the sinks it interacted with during the step, picked at random when there
+        # are several. Returns replicates x sinks.
+        num_sinks = interaction_occured.shape[1]
+        emerging = self.worm_pop.worms_emerging(interaction_occured.any(axis=1))
+        hosts = np.flatnonzero(emerging)
+        if num_sinks > 1:
+            sink_index = np.argmax(interaction_occured[hosts] * self.rng.random((len(hosts), num_sinks)), axis=1)
+        else:
+            sink_index = np.zeros(len(hosts), dtype=np.int64)
+        return np.bincount(
+            (hosts // self.num_individuals) * num_sinks + sink_index,
+            weights=emerging[hosts],
+            minlength=self.num_replicates * num_sinks
+        ).reshape(self.num_replicates, num_sinks)
 
+    def empty_stats(self) -> dict[str, list[float]]:
+        # stats() of a population without any worms
         return {
-            "total_worm_prev": num_infected_with_worm,
-            "female_worm_prev": female_worm_prev,
-            "total_worm_load_per_person": worm_load_per_person,
-            "female_worm_load_per_person": female_worm_load_per_person
-        }
\ No newline at end of file
+            "total_worm_prev": np.zeros(self.num_replicates),
+            "female_worm_prev": np.zeros(self.num_replicates),
+            "total_worm_load_per_person": np.zeros(self.num_replicates),
+            "female_worm_load_per_person": np.zeros(self.num_replicates)
+        }
+
+    def stats(self, stat_names: list[str] = None) -> dict[str, list[float]]:
+        # Only the stats in stat_names are computed, all of them when None
+        if stat_names is None:
+            stat_names = ["total_worm_prev", "female_worm_prev", "total_worm_load_per_person", "female_worm_load_per_person"]
+        stats = {}
+        if "total_worm_prev" in stat_names or "total_worm_load_per_person" in stat_names:
+            total_worm_burden = self.by_replicate(self.worm_pop.get_total_worms())
+            stats["total_worm_prev"] = np.mean(total_worm_burden > 0, axis=1)
+            stats["total_worm_load_per_person"] = np.mean(total_worm_burden, axis=1)
+        if "female_worm_prev" in stat_names or "female_worm_load_per_person" in stat_names:
+            female_worm_burden = self.by_replicate(self.worm_pop.get_female_worm_burden())
+            stats["female_worm_prev"] = np.mean(female_worm_burden > 0, axis=1)
+            stats["female_worm_load_per_person"] = np.mean(female_worm_burden, axis=1)
+
+        return stats
@@ -0,0 +1,105 @@
+import contextlib
+import time
+import tracemalloc
+import numpy as np
+
+# Shared by every Model that is not being profiled, so a phase costs one method call
+NOT_PROFILING = contextlib.nullcontext()
+
+
+class ModelProfiler:
+    # Wall time, calls, random numbers drawn and, with track_memory, the largest
+    # extra traced memory of a single call, per phase of Model.iterateModel.
+    # Draws made outside any phase are counted under "unattributed".
+    # Temporary arrays are measured by the memory they add at their peak, not
+    # counted: tracemalloc only keeps the allocations that are still alive.
+    track_memory: bool
+    steps: int
+    phases: dict[str, dict[str, float]]
+    _active: list[str]
+    # Whether this profiler turned tracemalloc on, and so has to turn it off
+    _started_tracing: bool
+
+    def __init__(self, track_memory: bool = False):
+        self.track_memory = track_memory
+        self.steps = 0
+        self.phases = {}
+        self._active = []
+        self._started_tracing = track_memory and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+
+    def close(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _totals(self, name: str) -> dict[str, float]:
+        if name not in self.phases:
+            self.phases[name] = {"calls": 0, "seconds": 0.0, "rng_draws": 0, "peak_bytes": 0}
+        return self.phases[name]
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        totals = self._totals(name)
+        self._active.append(name)
+        if self.track_memory:
+            start_bytes, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            totals["seconds"] += time.perf_counter() - start
+            totals["calls"] += 1
+            if self.track_memory:
+                _, peak_bytes = tracemalloc.get_traced_memory()
+                totals["peak_bytes"] = max(totals["peak_bytes"], peak_bytes - start_bytes)
+            self._active.pop()
+
+    def count_draws(self, draws: int):
+        self._totals(self._active[-1] if len(self._active) > 0 else "unattributed")["rng_draws"] += draws
+
+    def report(self) -> dict:
+        return {
+            "steps": self.steps,
+            "phases": {name: dict(totals) for name, totals in self.phases.items()},
+        }
+
+
+def merge_profiles(reports: list[dict]) -> dict:
+    # Combines ModelProfiler.report()s, e.g. from the workers of a sweep
+    merged = {"steps": 0, "phases": {}}
+    for report in reports:
+        merged["steps"] += report["steps"]
+        for name, totals in report["phases"].items():
+            merged_totals = merged["phases"].setdefault(
+                name, {"calls": 0, "seconds": 0.0, "rng_draws": 0, "peak_bytes": 0}
+            )
+            for key in ["calls", "seconds", "rng_draws"]:
+                merged_totals[key] += totals[key]
+            merged_totals["peak_bytes"] = max(merged_totals["peak_bytes"], totals["peak_bytes"])
+    return merged
+
+
+class CountingGenerator:
+    # Stands in for a numpy Generator and counts the random numbers it draws
+    generator: np.random.Generator
+    profiler: ModelProfiler
+
+    def __init__(self, generator: np.random.Generator, profiler: ModelProfiler):
+        self.generator = generator
+        self.profiler = profiler
+
+    def __getattr__(self, name: str):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        attribute = getattr(self.generator, name)
+        if name == "spawn" or not callable(attribute):
+            return attribute
+
+        def counted(*args, **kwargs):
+            draws = attribute(*args, **kwargs)
+            self.profiler.count_draws(np.size(draws))
+            return draws
+        return counted
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+from .state import Stateful
+
+
+class ModelResults(Stateful):
+    # One (population, measure) pair per series
+    series_populations: list[str]
+    series_measures: list[str]
+    num_replicates: int
+    num_records: int
+
+    # Preallocated, filled one record at a time
+    # Dimensions: records x series x replicates
+    years: list[float]
+    values: list[list[list[float]]]
+
+    _state_attributes = ["num_records", "years", "values"]
+
+    def __init__(self, series: list[tuple[str, str]], num_replicates: int, expected_records: int):
+        self.series_populations = [population for population, _ in series]
+        self.series_measures = [measure for _, measure in series]
+        self._series_index = {pair: index for index, pair in enumerate(series)}
+        self.num_replicates = num_replicates
+        self.num_records = 0
+        self.years = np.zeros(max(expected_records, 1))
+        self.values = np.zeros((max(expected_records, 1), len(series), num_replicates))
+
+    def reset(self):
+        # New arrays of the same size: to_dataframe() hands out views of the old
+        # ones, which have to keep the previous run's values
+        self.num_records = 0
+        self.years = np.zeros_like(self.years)
+        self.values = np.zeros_like(self.values)
+
+    def series_index(self, population: str, measure: str) -> int:
+        return self._series_index[(population, measure)]
+
+    def new_record(self, year: float) -> int:
+        if self.num_records == len(self.years):
+            self.years = np.concatenate((self.years, np.zeros(len(self.years))))
+            self.values = np.concatenate((self.values, np.zeros(self.values.shape)))
+        record = self.num_records
+        self.years[record] = year
+        self.num_records += 1
+        return record
+
+    def record(self, record: int, population: str, measure: str, value: list[float]):
+        self.values[record, self._series_index[(population, measure)]] = value
+
+    def to_dataframe(self) -> pd.DataFrame:
+        num_series = len(self.series_measures)
+        rows_per_record = num_series * self.num_replicates
+        population_names, population_codes = np.unique(self.series_populations, return_inverse=True)
+        measure_names, measure_codes = np.unique(self.series_measures, return_inverse=True)
+        # values is C-ordered as record, series, replicate so the value column is a view
+        return pd.DataFrame({
+            "year": np.repeat(self.years[:self.num_records], rows_per_record),
+            "population": pd.Categorical.from_codes(
+                np.tile(np.repeat(population_codes, self.num_replicates), self.num_records),
+                categories=population_names
+            ),
+            "replicate": np.tile(np.arange(self.num_replicates), num_series * self.num_records),
+            "measure": pd.Categorical.from_codes(
+                np.tile(np.repeat(measure_codes, self.num_replicates), self.num_records),
+                categories=measure_names
+            ),
+            "value": self.values[:self.num_records].reshape(-1),
+        }, copy=False)
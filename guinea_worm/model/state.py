@@ -0,0 +1,30 @@
+import numpy as np
+
+
+class Stateful:
+    # Names of the attributes that make up the simulation state. Together they
+    # are enough to continue a run, and are what checkpoints save and restore.
+    _state_attributes: list[str] = []
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        return {name: np.asarray(getattr(self, name)) for name in self._state_attributes}
+
+    def set_state(self, state: dict[str, np.ndarray]):
+        for name in self._state_attributes:
+            value = np.asarray(state[name])
+            setattr(self, name, value.item() if value.ndim == 0 else value.copy())
+
+    def memory_footprint(self) -> int:
+        # Bytes held by the object's own numpy arrays
+        return sum(value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray))
+
+
+def prefix_state(prefix: str, state: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    return {f"{prefix}__{name}": value for name, value in state.items()}
+
+
+def unprefix_state(prefix: str, state: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    return {
+        name[len(prefix) + 2:]: value for name, value in state.items()
+        if name.startswith(f"{prefix}__")
+    }
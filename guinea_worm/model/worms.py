@@ -1,17 +1,29 @@
 import numpy as np
+from .state import Stateful
 
-class Worms:
+
+class BaseWorms(Stateful):
     worm_death_rate: int
-    death_prob_by_age: float
     sex_ratio: float = 0.5
     worm_maturity_age_days: int
     mating_probability: float
     emergences: list[int]
-    mature_male_has_existed: list[list[int]]
+    max_worm_age: int
+    individuals: int
+    rng: np.random.Generator
+    # Integer type worm counts are stored in; narrow types such as uint8 cut
+    # memory, and adding worms beyond what they can hold raises OverflowError
+    worm_dtype: np.dtype
+    # death_probability of every worm age, computed once
+    death_prob_by_age: list[float]
+    # Model time the worms have been aged to, and the last time each host carried
+    # a male worm when aged (-1 if never). A female cohort has mated once its host
+    # has carried a male since the cohort was injested, i.e. when
+    # last_male_time >= the cohort's birth time.
+    _time: int
+    last_male_time: list[int]
 
-    # Rows = Individuals, Columns = Worm/Larvae Age
-    male_worms: list[list[int]]
-    female_worms: list[list[int]]
+    _state_attributes = ["emergences", "_time", "last_male_time"]
 
     def __init__(
         self,
@@ -19,91 +31,342 @@ class Worms:
         max_worm_age: int,
         individuals: int,
         mating_probability: float,
-        worm_maturity_age_days: int
+        worm_maturity_age_days: int,
+        rng: np.random.Generator = None,
+        worm_dtype: str = "int64",
     ):
+        if worm_dtype not in WORM_COUNT_DTYPES:
+            raise ValueError(f"worm_dtype should be one of {WORM_COUNT_DTYPES}, got {worm_dtype}")
+        self.worm_dtype = np.dtype(worm_dtype)
         self.worm_death_rate = worm_death_rate
-        self.male_worms = np.full((individuals, max_worm_age), 0)
-        self.female_worms = np.full((individuals, max_worm_age), 0)
-        self.mature_male_has_existed = np.full((individuals, max_worm_age), False)
+        self.max_worm_age = max_worm_age
+        self.individuals = individuals
         self.worm_maturity_age_days = worm_maturity_age_days
-        prob_death_array = 1 - np.exp(-(self.worm_death_rate) * np.arange(0, max_worm_age))
-        prob_death_array[:worm_maturity_age_days] = 0
-        prob_death_array[-1] = 1
-        self.death_prob_by_age = np.tile(prob_death_array, (individuals, 1))
         self.mating_probability = mating_probability
         self.emergences = np.zeros(individuals)
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.death_prob_by_age = self.death_probability(np.arange(max_worm_age))
+        self._time = 0
+        self.last_male_time = np.full(individuals, -1, dtype=np.int64)
+
+    def reset(self):
+        # Back to no worms at all, reusing the existing arrays where possible
+        self.emergences = np.zeros(self.individuals)
+        self._time = 0
+        self.last_male_time.fill(-1)
+
+    def mark_males(self, hosts_with_males: list[bool]):
+        self.last_male_time[hosts_with_males] = self._time
+
+    def has_mated(self, hosts: list[int], birth_times: list[int]) -> list[bool]:
+        return self.last_male_time[hosts] >= birth_times
+
+    def check_capacity(self, worms: list[int], new_worms: list[int]):
+        if (new_worms > np.iinfo(self.worm_dtype).max - worms).any():
+            raise OverflowError(
+                f"worm counts no longer fit in {self.worm_dtype}, use a wider worm_dtype"
+            )
+
+    def death_probability(self, worm_ages: list[int]) -> list[float]:
+        prob_death = 1 - np.exp(-(self.worm_death_rate) * worm_ages)
+        prob_death[worm_ages < self.worm_maturity_age_days] = 0
+        prob_death[worm_ages == self.max_worm_age - 1] = 1
+        return prob_death
+
+    def worms_emerging(self, interaction_occured: list[bool]) -> list[int]:
+        # Emergences are consumed by the hosts that interacted with the sink
+        number_of_female_worms_emerging = np.where(interaction_occured, self.emergences, 0)
+        self.emergences = np.where(interaction_occured, 0, self.emergences)
+        return number_of_female_worms_emerging
+
+
+class Worms(BaseWorms):
+    # Rows = Individuals, Columns = Worm/Larvae Age. The columns are a ring
+    # buffer: age 0 lives in column _head and age a in column (_head + a) % max_worm_age
+    male_worms: list[list[int]]
+    female_worms: list[list[int]]
+    _head: int
+    # Row sums of male_worms and female_worms, kept up to date as worms are
+    # injested, die or are cleared rather than recomputed from the matrices
+    male_count: list[int]
+    female_count: list[int]
+
+    _state_attributes = BaseWorms._state_attributes + [
+        "_head", "male_worms", "female_worms"
+    ]
+
+    def __init__(
+        self,
+        worm_death_rate: float,
+        max_worm_age: int,
+        individuals: int,
+        mating_probability: float,
+        worm_maturity_age_days: int,
+        rng: np.random.Generator = None,
+        worm_dtype: str = "int64",
+    ):
+        super().__init__(
+            worm_death_rate=worm_death_rate,
+            max_worm_age=max_worm_age,
+            individuals=individuals,
+            mating_probability=mating_probability,
+            worm_maturity_age_days=worm_maturity_age_days,
+            rng=rng,
+            worm_dtype=worm_dtype
+        )
+        self._head = 0
+        self.male_worms = np.zeros((individuals, max_worm_age), dtype=self.worm_dtype)
+        self.female_worms = np.zeros((individuals, max_worm_age), dtype=self.worm_dtype)
+        self.male_count = np.zeros(individuals, dtype=np.int64)
+        self.female_count = np.zeros(individuals, dtype=np.int64)
+
+    def reset(self):
+        super().reset()
+        self._head = 0
+        self.male_worms.fill(0)
+        self.female_worms.fill(0)
+        self.male_count.fill(0)
+        self.female_count.fill(0)
+
+    def _column_ages(self):
+        return (np.arange(self.max_worm_age) - self._head) % self.max_worm_age
+
+    def _count_worms(self):
+        self.male_count = np.sum(self.male_worms, axis=1, dtype=np.int64)
+        self.female_count = np.sum(self.female_worms, axis=1, dtype=np.int64)
+
+    def set_state(self, state: dict[str, np.ndarray]):
+        super().set_state(state)
+        self.male_worms = self.male_worms.astype(self.worm_dtype, copy=False)
+        self.female_worms = self.female_worms.astype(self.worm_dtype, copy=False)
+        self._count_worms()
+
+    def _occupied_cells(self, worms: list[list[int]], infected: list[int]):
+        # Selecting the infected rows only pays off when a good share of hosts is uninfected
+        if 2 * len(infected) > self.individuals:
+            return np.nonzero(worms)
+        rows, columns = np.nonzero(worms[infected])
+        return infected[rows], columns
+
+    def seed_worms(self, individuals: list[int]):
+        self.male_worms[individuals, self._head] = 1
+        self.female_worms[individuals, self._head] = 1
+        self._count_worms()
+
+    def has_worms(self) -> bool:
+        return self.male_count.any() or self.female_count.any() or self.emergences.any()
 
     def get_total_worms(self):
-        return np.sum(self.male_worms, axis=1) + np.sum(self.female_worms, axis=1)
+        return self.male_count + self.female_count
     
     def get_female_worm_burden(self):
-        return np.sum(self.female_worms, axis=1)
+        return self.female_count.copy()
     
     def get_mating_probability(self):
-        if np.sum(self.female_worms) == 0:
+        if np.sum(self.female_count) == 0:
             return 0
+        female_rows, female_columns = np.nonzero(self.female_worms)
+        mated = self.has_mated(female_rows, self._time - self._column_ages()[female_columns])
         return (
-            np.sum(self.mature_male_has_existed) /
-            np.sum(self.female_worms)
+            np.sum(self.female_worms[female_rows[mated], female_columns[mated]]) /
+            np.sum(self.female_count)
         )
     
     def new_worms_injested(self, new_worms: list[int]):
-        new_male_worms = np.random.binomial(new_worms, self.sex_ratio)
-        new_female_worms = new_worms - new_male_worms
-        self.male_worms[:, 0] += new_male_worms
-        self.female_worms[:, 0] += new_female_worms
-    
+        new_male_worms = self.rng.binomial(new_worms, self.sex_ratio)
+        self.injest_worms(np.arange(self.individuals), new_male_worms, new_worms - new_male_worms)
+
+    def injest_worms(self, hosts: list[int], new_male_worms: list[int], new_female_worms: list[int]):
+        # hosts are distinct host indices, with their new worms of each sex
+        if len(hosts) > self.individuals // 2:
+            # Most hosts take in worms: adding whole columns is cheaper than scattering into them
+            new_male_worms = self._scatter(hosts, new_male_worms)
+            new_female_worms = self._scatter(hosts, new_female_worms)
+            hosts = slice(None)
+        self.check_capacity(self.male_worms[hosts, self._head], new_male_worms)
+        self.check_capacity(self.female_worms[hosts, self._head], new_female_worms)
+        self.male_worms[hosts, self._head] += new_male_worms.astype(self.worm_dtype)
+        self.female_worms[hosts, self._head] += new_female_worms.astype(self.worm_dtype)
+        self.male_count[hosts] += new_male_worms
+        self.female_count[hosts] += new_female_worms
+
+    def _scatter(self, hosts: list[int], values: list[int]) -> list[int]:
+        scattered = np.zeros(self.individuals, dtype=np.int64)
+        scattered[hosts] = values
+        return scattered
+
     def process_host_death(self, individuals: list[bool]):
         self.male_worms[individuals, :] = 0
         self.female_worms[individuals, :] = 0
+        self.male_count[individuals] = 0
+        self.female_count[individuals] = 0
+        self.last_male_time[individuals] = -1
 
     def age(self, timestep: int) -> int:
-        self.mature_male_has_existed = np.logical_or(
-            self.mature_male_has_existed,
-            np.tile((np.sum(self.male_worms, axis=1) > 0)[:, np.newaxis], (1, self.mature_male_has_existed.shape[1]))
+        # Hosts without worms have nothing to age; only the rows of the others are scanned
+        infected = np.flatnonzero(self.male_count + self.female_count)
+        self.mark_males(self.male_count > 0)
+        column_ages = self._column_ages()
+
+        # Each occupied cell is a cohort; draw how many of its worms die rather
+        # than a single life-or-death outcome for the whole cell.
+        male_rows, male_columns = self._occupied_cells(self.male_worms, infected)
+        male_deaths = self.rng.binomial(
+            self.male_worms[male_rows, male_columns],
+            self.death_prob_by_age[column_ages[male_columns]]
         )
-        # mature_male_existed = np.sum(self.male_worms, axis=1) > 0
-        # mature_male_existed[:self.worm_maturity_age_days] = False
-        female_worm_deaths = np.where(np.random.rand(*self.male_worms.shape) < self.death_prob_by_age, True, False)
-        male_worm_deaths = np.where(np.random.rand(*self.female_worms.shape) < self.death_prob_by_age, True, False)
-        
-        dead_males = self.male_worms[male_worm_deaths]
-
-        self.emergences = np.sum(np.where(
-            np.logical_and(
-                female_worm_deaths,
-                self.mature_male_has_existed
-            ),
-            self.female_worms,
-            0
-        ), axis=1)
-
-        # self.emergences = np.where(
-        #     np.logical_and(
-        #         dead_females,
-        #         mature_male_existed
-        #     ),
-        #     dead_females,
-        #     0
-        # )
-
-        self.male_worms[male_worm_deaths] = 0
-        self.female_worms[female_worm_deaths] = 0
-
-        self.male_worms = np.roll(self.male_worms, shift=timestep, axis=1)
-        self.female_worms = np.roll(self.female_worms, shift=timestep, axis=1)
-        self.mature_male_has_existed = np.roll(self.mature_male_has_existed, shift=timestep, axis=1)
-
-        self.male_worms[:, :timestep] = 0
-        self.female_worms[:, :timestep] = 0
-        self.mature_male_has_existed[:, :timestep] = 0
-
-        
-    def worms_emerging(self, interaction_occured: list[bool]) -> float:
-        emergences_occuring = self.emergences > 0
-        number_of_female_worms_emerging = 0
-        if (emergences_occuring[interaction_occured]).any():
-            number_of_female_worms_emerging = np.sum(self.emergences[interaction_occured])
-
-            self.emergences = np.zeros(len(self.emergences))
-        return number_of_female_worms_emerging
+        self.male_worms[male_rows, male_columns] -= male_deaths.astype(self.worm_dtype)
+        self.male_count -= np.bincount(male_rows, weights=male_deaths, minlength=self.individuals).astype(np.int64)
+
+        female_rows, female_columns = self._occupied_cells(self.female_worms, infected)
+        female_deaths = self.rng.binomial(
+            self.female_worms[female_rows, female_columns],
+            self.death_prob_by_age[column_ages[female_columns]]
+        )
+        self.female_worms[female_rows, female_columns] -= female_deaths.astype(self.worm_dtype)
+        self.female_count -= np.bincount(female_rows, weights=female_deaths, minlength=self.individuals).astype(np.int64)
+
+        mated = self.has_mated(female_rows, self._time - column_ages[female_columns])
+        self.emergences = np.bincount(
+            female_rows[mated],
+            weights=female_deaths[mated],
+            minlength=self.individuals
+        ).astype(np.int64)
+
+        # Moving the head back by timestep ages every column at once; only the
+        # columns that wrap around to become the youngest ages need clearing.
+        self._time += timestep
+        self._head = (self._head - timestep) % self.max_worm_age
+        youngest_columns = (self._head + np.arange(min(timestep, self.max_worm_age))) % self.max_worm_age
+        self.male_count[infected] -= np.sum(self.male_worms[np.ix_(infected, youngest_columns)], axis=1, dtype=np.int64)
+        self.female_count[infected] -= np.sum(self.female_worms[np.ix_(infected, youngest_columns)], axis=1, dtype=np.int64)
+        self.male_worms[:, youngest_columns] = 0
+        self.female_worms[:, youngest_columns] = 0
+
+
+class SparseWorms(BaseWorms):
+    # One record per worm cohort: the host it lives in, the model time it was
+    # injested, its sex and how many worms it holds. Only non-empty cohorts are kept.
+    cohort_host: list[int]
+    cohort_birth: list[int]
+    cohort_is_male: list[bool]
+    cohort_count: list[int]
+
+    _state_attributes = BaseWorms._state_attributes + [
+        "cohort_host", "cohort_birth", "cohort_is_male", "cohort_count"
+    ]
+
+    def __init__(
+        self,
+        worm_death_rate: float,
+        max_worm_age: int,
+        individuals: int,
+        mating_probability: float,
+        worm_maturity_age_days: int,
+        rng: np.random.Generator = None,
+        worm_dtype: str = "int64",
+    ):
+        super().__init__(
+            worm_death_rate=worm_death_rate,
+            max_worm_age=max_worm_age,
+            individuals=individuals,
+            mating_probability=mating_probability,
+            worm_maturity_age_days=worm_maturity_age_days,
+            rng=rng,
+            worm_dtype=worm_dtype
+        )
+        self.cohort_host = np.zeros(0, dtype=np.int64)
+        self.cohort_birth = np.zeros(0, dtype=np.int64)
+        self.cohort_is_male = np.zeros(0, dtype=bool)
+        self.cohort_count = np.zeros(0, dtype=self.worm_dtype)
+
+    def set_state(self, state: dict[str, np.ndarray]):
+        super().set_state(state)
+        self.cohort_count = self.cohort_count.astype(self.worm_dtype, copy=False)
+
+    def reset(self):
+        super().reset()
+        self._keep_cohorts(np.zeros(len(self.cohort_count), dtype=bool))
+
+    def _add_cohorts(self, hosts: list[int], is_male: bool, counts: list[int]):
+        self.cohort_host = np.concatenate((self.cohort_host, hosts))
+        self.cohort_birth = np.concatenate((self.cohort_birth, np.full(len(hosts), self._time)))
+        self.cohort_is_male = np.concatenate((self.cohort_is_male, np.full(len(hosts), is_male)))
+        self.check_capacity(0, counts)
+        self.cohort_count = np.concatenate((self.cohort_count, np.asarray(counts).astype(self.worm_dtype)))
+
+    def _keep_cohorts(self, keep: list[bool]):
+        self.cohort_host = self.cohort_host[keep]
+        self.cohort_birth = self.cohort_birth[keep]
+        self.cohort_is_male = self.cohort_is_male[keep]
+        self.cohort_count = self.cohort_count[keep]
+
+    def _count_by_host(self, cohorts: list[bool]) -> list[int]:
+        return np.bincount(
+            self.cohort_host[cohorts],
+            weights=self.cohort_count[cohorts],
+            minlength=self.individuals
+        ).astype(np.int64)
+
+    def seed_worms(self, individuals: list[int]):
+        hosts = np.asarray(individuals)
+        self._add_cohorts(hosts, True, np.ones(len(hosts), dtype=np.int64))
+        self._add_cohorts(hosts, False, np.ones(len(hosts), dtype=np.int64))
+
+    def has_worms(self) -> bool:
+        return len(self.cohort_count) > 0 or self.emergences.any()
+
+    def get_total_worms(self):
+        return self._count_by_host(slice(None))
+
+    def get_female_worm_burden(self):
+        return self._count_by_host(~self.cohort_is_male)
+
+    def get_mating_probability(self):
+        female_worms = np.sum(self.cohort_count[~self.cohort_is_male])
+        if female_worms == 0:
+            return 0
+        mated = ~self.cohort_is_male & self.has_mated(self.cohort_host, self.cohort_birth)
+        return np.sum(self.cohort_count[mated]) / female_worms
+
+    def new_worms_injested(self, new_worms: list[int]):
+        new_male_worms = self.rng.binomial(new_worms, self.sex_ratio)
+        self.injest_worms(np.arange(self.individuals), new_male_worms, new_worms - new_male_worms)
+
+    def injest_worms(self, hosts: list[int], new_male_worms: list[int], new_female_worms: list[int]):
+        male = np.flatnonzero(new_male_worms)
+        female = np.flatnonzero(new_female_worms)
+        self._add_cohorts(hosts[male], True, new_male_worms[male])
+        self._add_cohorts(hosts[female], False, new_female_worms[female])
+
+    def process_host_death(self, individuals: list[bool]):
+        self._keep_cohorts(~np.isin(self.cohort_host, individuals))
+        self.last_male_time[individuals] = -1
+
+    def age(self, timestep: int) -> int:
+        self.mark_males(self.cohort_host[self.cohort_is_male])
+
+        deaths = self.rng.binomial(
+            self.cohort_count,
+            self.death_prob_by_age[self._time - self.cohort_birth]
+        )
+        self.cohort_count -= deaths.astype(self.worm_dtype)
+
+        emerging = ~self.cohort_is_male & self.has_mated(self.cohort_host, self.cohort_birth)
+        self.emergences = np.bincount(
+            self.cohort_host[emerging],
+            weights=deaths[emerging],
+            minlength=self.individuals
+        ).astype(np.int64)
+
+        # Cohorts aged past max_worm_age fall off the end, as in the dense ring buffer
+        self._time += timestep
+        self._keep_cohorts((self.cohort_count > 0) & (self._time - self.cohort_birth < self.max_worm_age))
+
+
+WORM_COUNT_DTYPES = ["uint8", "uint16", "uint32", "int64"]
+
+WORM_STORAGE_BACKENDS = {
+    "dense": Worms,
+    "sparse": SparseWorms,
+}
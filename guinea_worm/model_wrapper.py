@@ -1,21 +1,36 @@
+import copy
+import numpy as np
 from .tools import process_data
 from .model.population import HostPopulation, SinkPopulation
 from .model.model import Model
+from .model.intervention import Intervention, InterventionEvent
 
 class GuineaWormModel:
     model: Model
-    
+    rng: np.random.Generator
 
-    def __init__(self, sink_info: list[dict], host_info: list[dict], model_info: dict):
+    def __init__(
+        self,
+        sink_info: list[dict],
+        host_info: list[dict],
+        model_info: dict,
+        seed: int | np.random.SeedSequence = None,
+        num_replicates: int = 1,
+    ):
+        # A single Generator is shared by every population and the model so that
+        # a run is fully determined by its seed
+        self.rng = np.random.default_rng(seed)
         sink_pops = {}
         for sink_params in sink_info:
-            sink_params["r0_worm_to_sink"] = (model_info["r0"] ** (model_info["transmission_asymmetry"]))
-            tmp_sink = SinkPopulation(**sink_params)
+            sink_params["r0_worm_to_sink"] = (
+                np.asarray(model_info["r0"], dtype=float) ** np.asarray(model_info["transmission_asymmetry"], dtype=float)
+            )
+            tmp_sink = SinkPopulation(**sink_params, num_replicates=num_replicates)
             sink_pops[tmp_sink.population_name] = tmp_sink
         
         host_pops = {}
         for host_params in host_info:
-            tmp_host = HostPopulation(**host_params)
+            tmp_host = HostPopulation(**host_params, rng=self.rng, num_replicates=num_replicates)
             for sink_name in tmp_host.sink_name_order:
                 sink_pops[sink_name].update_host_population(tmp_host.num_individuals)
             host_pops[tmp_host.population_name] = tmp_host
@@ -24,13 +39,63 @@ class GuineaWormModel:
             "host_populations": host_pops,
             "sink_populations": sink_pops
         }
-        self.model = Model(**model_info, **population_info)
+        self.model = Model(**model_info, **population_info, rng=self.rng, num_replicates=num_replicates)
 
     def iterateFullModel(self):
         model_finished = False
-        all_data = []
         while not(model_finished):
-            model_finished, data_output = self.model.iterateModel()
-            if data_output:
-                all_data.append(data_output)
-        return process_data(all_data)
\ No newline at end of file
+            model_finished = self.model.iterateModel()
+        with self.model.phase("process_data"):
+            return process_data(self.model.results)
+
+    def reset(
+        self,
+        seed: int | np.random.SeedSequence = None,
+        r0: float | list[float] = None,
+        transmission_asymmetry: float | list[float] = None,
+        NcNd: float | list[float] = None,
+        infectivity_rate: float | list[float] = None,
+    ):
+        # Starts the model over in place, as if it had just been built with this
+        # seed and these parameter values, without allocating it again
+        self.rng = np.random.default_rng(seed)
+        self.model.set_rng(self.rng)
+        self.model.set_parameters(r0=r0, transmission_asymmetry=transmission_asymmetry, NcNd=NcNd)
+        self.model.reset(infectivity_rate)
+
+    def run_until(self, time: int):
+        # Advances the model to the given time without finishing the run, e.g. to
+        # complete a burn-in before forking it with fork()
+        while (self.model.time < time) and (self.model.time <= self.model.endtime):
+            self.model.iterateModel()
+
+    def fork(
+        self,
+        num_branches: int,
+        branch_parameters: list[dict] = None,
+        branch_interventions: list[dict[InterventionEvent, Intervention] | list[Intervention]] = None,
+    ) -> list["GuineaWormModel"]:
+        # Each branch starts from a copy of the current state, including the results
+        # recorded so far, and continues with its own RNG stream. branch_parameters
+        # holds Model.set_parameters arguments (r0, transmission_asymmetry, NcNd) per branch.
+        # Observers are not copied, as queues and the like cannot be; every branch
+        # reports to the parent's observers, which can be swapped per branch with
+        # remove_observer and add_observer.
+        branch_rngs = self.rng.spawn(num_branches)
+        branches = []
+        for branch_index in range(num_branches):
+            branch = copy.deepcopy(self, {id(observer): observer for observer in self.model.observers})
+            branch.rng = branch_rngs[branch_index]
+            branch.model.set_rng(branch.rng)
+            if branch_parameters is not None:
+                branch.model.set_parameters(**branch_parameters[branch_index])
+            if branch_interventions is not None:
+                branch.model.set_interventions(branch_interventions[branch_index])
+            branches.append(branch)
+        return branches
+
+    def save_checkpoint(self, path: str):
+        self.model.save_checkpoint(path)
+
+    def load_checkpoint(self, path: str):
+        self.model.load_checkpoint(path)
@@ -0,0 +1,194 @@
+import copy
+import itertools
+import numpy as np
+import pandas as pd
+from .model_wrapper import GuineaWormModel
+from .model.profiling import merge_profiles
+from .sweep_store import SweepStore
+from .tools import process_data
+
+# Parameters that can differ between the replicates of a single model, and so
+# can be swept by stacking parameter points along the replicate axis
+SWEEP_MODEL_PARAMETERS = ["r0", "transmission_asymmetry", "NcNd"]
+SWEEP_SINK_PARAMETERS = ["infectivity_rate"]
+
+
+def parameter_grid(parameter_values: dict[str, list[float]]) -> dict[str, list[float]]:
+    for parameter_name in parameter_values:
+        if parameter_name not in SWEEP_MODEL_PARAMETERS + SWEEP_SINK_PARAMETERS:
+            raise ValueError(
+                f"Cannot sweep over {parameter_name}, should be one of {SWEEP_MODEL_PARAMETERS + SWEEP_SINK_PARAMETERS}"
+            )
+    parameter_names = list(parameter_values.keys())
+    points = list(itertools.product(*[parameter_values[name] for name in parameter_names]))
+    return {
+        name: np.array([point[index] for point in points], dtype=float)
+        for index, name in enumerate(parameter_names)
+    }
+
+
+def lane_configuration(
+    sink_info: list[dict],
+    model_info: dict,
+    lane_values: dict[str, list[float]],
+) -> tuple[list[dict], dict]:
+    # Copies of sink_info and model_info with the given parameters set to one value per lane
+    sink_info = copy.deepcopy(sink_info)
+    for sink_params in sink_info:
+        for name in SWEEP_SINK_PARAMETERS:
+            if name in lane_values:
+                sink_params[name] = lane_values[name]
+    model_info = dict(model_info)
+    for name in SWEEP_MODEL_PARAMETERS:
+        if name in lane_values:
+            model_info[name] = lane_values[name]
+    return sink_info, model_info
+
+
+def seed_sequence(seed: int | np.random.SeedSequence = None) -> np.random.SeedSequence:
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+
+def sweep_batches(
+    grid: dict[str, list[float]],
+    sink_info: list[dict],
+    host_info: list[dict],
+    model_info: dict,
+    num_replicates: int = 1,
+    points_per_batch: int = 64,
+    seed: int | np.random.SeedSequence = None,
+    profile: bool = False,
+) -> list[dict]:
+    # With profile, each batch output carries its model's profiling report, which
+    # merge_profiles combines across batches
+    num_points = len(next(iter(grid.values())))
+    batch_starts = range(0, num_points, points_per_batch)
+    batch_seeds = seed_sequence(seed).spawn(len(batch_starts))
+    batches = []
+    for batch_index, (batch_start, batch_seed) in enumerate(zip(batch_starts, batch_seeds)):
+        points = np.arange(batch_start, min(batch_start + points_per_batch, num_points))
+        batches.append({
+            "index": batch_index,
+            "points": points,
+            "grid": {name: values[points] for name, values in grid.items()},
+            "sink_info": sink_info,
+            "host_info": host_info,
+            "model_info": model_info,
+            "num_replicates": num_replicates,
+            "seed": batch_seed,
+            "profile": profile,
+        })
+    return batches
+
+
+def simulate_sweep_batch(batch: dict) -> dict:
+    num_replicates = batch["num_replicates"]
+    # Every (point, replicate) pair is one replicate of a single batched model
+    lane_values = {name: np.repeat(values, num_replicates) for name, values in batch["grid"].items()}
+    num_lanes = len(batch["points"]) * num_replicates
+
+    sink_info, model_info = lane_configuration(batch["sink_info"], batch["model_info"], lane_values)
+
+    gw_model = GuineaWormModel(
+        sink_info=sink_info,
+        host_info=copy.deepcopy(batch["host_info"]),
+        model_info=model_info,
+        seed=batch["seed"],
+        num_replicates=num_lanes,
+    )
+    if batch.get("profile"):
+        gw_model.model.enable_profiling()
+    model_finished = False
+    while not(model_finished):
+        model_finished = gw_model.model.iterateModel()
+
+    lanes = np.arange(num_lanes)
+    batch_output = {
+        "index": batch["index"],
+        "points": batch["points"][lanes // num_replicates],
+        "replicates": lanes % num_replicates,
+        "parameters": lane_values,
+        # Every lane of a batch draws from the batch's one Generator, so a point's
+        # results only reproduce when its whole batch is rerun: sweep_batches with the
+        # same parameter_values, num_replicates, points_per_batch and seed_entropy,
+        # indexed by seed_spawn_key (the batch index)
+        "seed_entropy": str(batch["seed"].entropy),
+        "seed_spawn_key": batch["seed"].spawn_key[0],
+        "results": gw_model.model.results,
+    }
+    if batch.get("profile"):
+        batch_output["profile"] = gw_model.model.disable_profiling()
+    return batch_output
+
+
+def sweep_batch_dataframe(batch_output: dict) -> pd.DataFrame:
+    batch_data = process_data(batch_output["results"])
+    lane = batch_data["replicate"].to_numpy()
+    batch_data["point"] = batch_output["points"][lane]
+    batch_data["replicate"] = batch_output["replicates"][lane]
+    for name, values in batch_output["parameters"].items():
+        batch_data[name] = values[lane]
+    batch_data["seed_entropy"] = batch_output["seed_entropy"]
+    batch_data["seed_spawn_key"] = batch_output["seed_spawn_key"]
+    return batch_data
+
+
+def run_sweep_batch(batch: dict) -> pd.DataFrame:
+    return sweep_batch_dataframe(simulate_sweep_batch(batch))
+
+
+def run_sweep(
+    parameter_values: dict[str, list[float]],
+    sink_info: list[dict],
+    host_info: list[dict],
+    model_info: dict,
+    num_replicates: int = 1,
+    points_per_batch: int = 64,
+    seed: int | np.random.SeedSequence = None,
+    map_function=map,
+    store: SweepStore = None,
+    profile: bool = False,
+) -> pd.DataFrame | SweepStore | tuple[pd.DataFrame | SweepStore, dict]:
+    # map_function can be swapped for e.g. Pool.imap_unordered to spread batches over processes.
+    # With a store, batches are appended to it as they finish instead of being
+    # gathered in memory, and batches already in the store are skipped.
+    # With profile, every batch's model is profiled and the merged report is
+    # returned along with the results.
+    if store is not None:
+        seed = store.open_sweep(
+            parameter_values,
+            {"sink_info": sink_info, "host_info": host_info, "model_info": model_info},
+            num_replicates, points_per_batch, seed_sequence(seed)
+        )
+    batches = sweep_batches(
+        parameter_grid(parameter_values),
+        sink_info=sink_info,
+        host_info=host_info,
+        model_info=model_info,
+        num_replicates=num_replicates,
+        points_per_batch=points_per_batch,
+        seed=seed,
+        profile=profile,
+    )
+    profiles = []
+    if store is None and not profile:
+        return pd.concat(list(map_function(run_sweep_batch, batches)), ignore_index=True)
+
+    if store is None:
+        batch_data = []
+        for batch_output in map_function(simulate_sweep_batch, batches):
+            profiles.append(batch_output["profile"])
+            batch_data.append(sweep_batch_dataframe(batch_output))
+        return pd.concat(batch_data, ignore_index=True), merge_profiles(profiles)
+
+    completed_batches = store.completed_batches()
+    batches = [batch for batch in batches if batch["index"] not in completed_batches]
+    for batch_output in map_function(simulate_sweep_batch, batches):
+        if profile:
+            profiles.append(batch_output["profile"])
+        store.append(batch_output)
+    if profile:
+        return store, merge_profiles(profiles)
+    return store
@@ -0,0 +1,211 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+import queue
+import numpy as np
+import pandas as pd
+from .model_wrapper import GuineaWormModel
+from .model.profiling import merge_profiles
+from .model.results import ModelResults
+from .sweep import (
+    SWEEP_MODEL_PARAMETERS, SWEEP_SINK_PARAMETERS,
+    lane_configuration, parameter_grid, sweep_batch_dataframe, sweep_batches, seed_sequence,
+)
+from .sweep_store import SweepStore
+
+# A sweep runner for long sweeps on a process pool. Every worker receives the model
+# configuration once, keeps the models it builds and starts them over in place
+# (GuineaWormModel.reset) for each new batch. Batches are dispatched in chunks and
+# each worker writes its results straight into a shared records x series x lanes
+# slot, so only a little metadata is pickled back. There are about processes x
+# chunksize slots, and a slot goes back to the next batch once the parent has
+# copied its results out.
+
+# Set in each worker by _init_worker
+_worker = {}
+
+
+def _attach_results(shared_name: str, shape: tuple[int, ...]):
+    shared = shared_memory.SharedMemory(name=shared_name)
+    return shared, np.ndarray(shape, dtype=float, buffer=shared.buf)
+
+
+def _init_worker(sink_info, host_info, model_info, num_replicates, shared_name, shape):
+    shared, values = _attach_results(shared_name, shape)
+    _worker.update({
+        "sink_info": sink_info,
+        "host_info": host_info,
+        "model_info": model_info,
+        "num_replicates": num_replicates,
+        "shared": shared,
+        "values": values,
+        # num_lanes -> GuineaWormModel; only the last batch can be smaller than the rest
+        "models": {},
+    })
+
+
+def _simulate_pooled_batch(batch: dict) -> dict:
+    num_replicates = _worker["num_replicates"]
+    lane_values = {name: np.repeat(values, num_replicates) for name, values in batch["grid"].items()}
+    num_lanes = len(batch["points"]) * num_replicates
+
+    gw_model = _worker["models"].get(num_lanes)
+    if gw_model is None:
+        sink_info, model_info = lane_configuration(_worker["sink_info"], _worker["model_info"], lane_values)
+        gw_model = GuineaWormModel(
+            sink_info=sink_info,
+            host_info=_worker["host_info"],
+            model_info=model_info,
+            seed=batch["seed"],
+            num_replicates=num_lanes,
+        )
+        _worker["models"][num_lanes] = gw_model
+    else:
+        gw_model.reset(
+            seed=batch["seed"],
+            **{name: values for name, values in lane_values.items() if name in SWEEP_MODEL_PARAMETERS + SWEEP_SINK_PARAMETERS}
+        )
+
+    if batch["profile"]:
+        gw_model.model.enable_profiling()
+    model_finished = False
+    while not(model_finished):
+        model_finished = gw_model.model.iterateModel()
+
+    results = gw_model.model.results
+    batch_values = _worker["values"][batch["slot"]]
+    if results.num_records != batch_values.shape[0]:
+        raise ValueError(
+            f"Expected {batch_values.shape[0]} records per run, got {results.num_records}"
+        )
+    batch_values[:, :, :num_lanes] = results.values[:results.num_records]
+
+    lanes = np.arange(num_lanes)
+    batch_output = {
+        "index": batch["index"],
+        "slot": batch["slot"],
+        "points": batch["points"][lanes // num_replicates],
+        "replicates": lanes % num_replicates,
+        "parameters": lane_values,
+        "seed_entropy": str(batch["seed"].entropy),
+        "seed_spawn_key": batch["seed"].spawn_key[0],
+        "years": results.years[:results.num_records].copy(),
+    }
+    if batch["profile"]:
+        batch_output["profile"] = gw_model.model.disable_profiling()
+    return batch_output
+
+
+def _batch_results(batch_output: dict, series: list[tuple[str, str]], values: list[list[list[list[float]]]]) -> ModelResults:
+    # A ModelResults holding a copy of the batch's slot of the shared results
+    num_lanes = len(batch_output["points"])
+    results = ModelResults(series, num_replicates=num_lanes, expected_records=0)
+    results.num_records = len(batch_output["years"])
+    results.years = batch_output["years"]
+    results.values = values[batch_output["slot"], :, :, :num_lanes].copy()
+    return results
+
+
+def run_sweep_pool(
+    parameter_values: dict[str, list[float]],
+    sink_info: list[dict],
+    host_info: list[dict],
+    model_info: dict,
+    num_replicates: int = 1,
+    points_per_batch: int = 64,
+    seed: int | np.random.SeedSequence = None,
+    processes: int = None,
+    chunksize: int = 4,
+    store: SweepStore = None,
+    progress=None,
+    profile: bool = False,
+) -> pd.DataFrame | SweepStore | tuple[pd.DataFrame | SweepStore, dict]:
+    # Same batches, seeds and output as run_sweep, including the merged profiling
+    # report with profile. progress, when given, wraps the iterator of finished
+    # batches, e.g. lambda batches, total: tqdm(batches, total=total).
+    if store is not None:
+        seed = store.open_sweep(
+            parameter_values,
+            {"sink_info": sink_info, "host_info": host_info, "model_info": model_info},
+            num_replicates, points_per_batch, seed_sequence(seed)
+        )
+    batches = sweep_batches(
+        parameter_grid(parameter_values),
+        sink_info=sink_info,
+        host_info=host_info,
+        model_info=model_info,
+        num_replicates=num_replicates,
+        points_per_batch=points_per_batch,
+        seed=seed,
+    )
+    if store is not None:
+        completed_batches = store.completed_batches()
+        batches = [batch for batch in batches if batch["index"] not in completed_batches]
+    # The configuration goes to each worker once, not with every batch
+    tasks = [
+        {"index": batch["index"], "points": batch["points"], "grid": batch["grid"], "seed": batch["seed"], "profile": profile}
+        for batch in batches
+    ]
+
+    # A model built up front gives the record count and series of every run
+    sink_info_lane, model_info_lane = lane_configuration(
+        sink_info, model_info, parameter_grid({name: values[:1] for name, values in parameter_values.items()})
+    )
+    layout_model = GuineaWormModel(sink_info_lane, host_info, model_info_lane, num_replicates=1).model
+    series = layout_model.result_series()
+    num_records = len(layout_model.results.years)
+    del layout_model
+
+    num_slots = max(1, min(len(tasks), (processes or os.cpu_count() or 1) * chunksize))
+    shape = (num_slots, num_records, len(series), points_per_batch * num_replicates)
+    shared = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+    values = np.ndarray(shape, dtype=float, buffer=shared.buf)
+    free_slots = queue.Queue()
+    for slot in range(num_slots):
+        free_slots.put(slot)
+
+    def tasks_with_slots():
+        # Runs in the pool's task handler thread, which waits here until the
+        # parent frees a slot; None stops it early when the sweep fails
+        for task in tasks:
+            slot = free_slots.get()
+            if slot is None:
+                return
+            yield dict(task, slot=slot)
+
+    outputs = []
+    profiles = []
+    try:
+        with multiprocessing.Pool(
+            processes=processes,
+            initializer=_init_worker,
+            initargs=(sink_info, host_info, model_info, num_replicates, shared.name, shape),
+        ) as pool:
+            finished = pool.imap_unordered(_simulate_pooled_batch, tasks_with_slots(), chunksize=chunksize)
+            if progress is not None:
+                finished = progress(finished, len(tasks))
+            try:
+                for batch_output in finished:
+                    if profile:
+                        profiles.append(batch_output.pop("profile"))
+                    batch_output["results"] = _batch_results(batch_output, series, values)
+                    free_slots.put(batch_output.pop("slot"))
+                    if store is not None:
+                        store.append(batch_output)
+                    else:
+                        outputs.append(sweep_batch_dataframe(batch_output))
+            finally:
+                free_slots.put(None)
+        if store is not None:
+            sweep_output = store
+        elif len(outputs) == 0:
+            sweep_output = pd.DataFrame()
+        else:
+            sweep_output = pd.concat(outputs, ignore_index=True)
+        if profile:
+            return sweep_output, merge_profiles(profiles)
+        return sweep_output
+    finally:
+        del values
+        shared.close()
+        shared.unlink()
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from .model.intervention import Intervention
+
+
+def configuration_hash(configuration: dict) -> str:
+    # A digest of the sink, host and model configuration a sweep was run with
+    def to_json(value):
+        if isinstance(value, (np.ndarray, np.generic)):
+            return value.tolist()
+        if isinstance(value, Intervention):
+            return {"intervention": vars(value)}
+        raise TypeError(f"Cannot hash a {type(value).__name__} in a sweep configuration")
+    model_info = configuration.get("model_info", {})
+    if isinstance(model_info.get("interventions"), dict):
+        # Keyed by (time, name) events, which JSON cannot encode; the model only uses the values
+        model_info = dict(model_info, interventions=list(model_info["interventions"].values()))
+        configuration = dict(configuration, model_info=model_info)
+    encoded = json.dumps(configuration, sort_keys=True, default=to_json).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class SweepStore:
+    # A directory holding one compressed .npz chunk per finished sweep batch and a
+    # sweep.json manifest. Each chunk stores its own parameter index (point,
+    # replicate and the swept parameters of every run) next to one
+    # runs x records array per (population, measure), so a single measure can be
+    # read without loading the others.
+    path: str
+
+    _manifest_name: str = "sweep.json"
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _chunk_path(self, batch_index: int) -> str:
+        return os.path.join(self.path, f"batch_{batch_index:06d}.npz")
+
+    def _chunk_paths(self) -> list[str]:
+        return sorted(
+            os.path.join(self.path, file_name) for file_name in os.listdir(self.path)
+            if file_name.startswith("batch_") and file_name.endswith(".npz")
+        )
+
+    def open_sweep(
+        self,
+        parameter_values: dict[str, list[float]],
+        configuration: dict,
+        num_replicates: int,
+        points_per_batch: int,
+        seed: np.random.SeedSequence,
+    ) -> np.random.SeedSequence:
+        # Starts a new sweep or checks that a resumed one matches what is already stored.
+        # Returns the seed to use, which is the stored one when resuming. configuration
+        # holds the sink_info, host_info and model_info of the sweep.
+        manifest = {
+            "parameter_values": {name: np.asarray(values, dtype=float).tolist() for name, values in parameter_values.items()},
+            "configuration_hash": configuration_hash(configuration),
+            "num_replicates": num_replicates,
+            "points_per_batch": points_per_batch,
+        }
+        manifest_path = os.path.join(self.path, self._manifest_name)
+        if not os.path.exists(manifest_path):
+            manifest["seed_entropy"] = str(seed.entropy)
+            with open(manifest_path, "w") as manifest_file:
+                json.dump(manifest, manifest_file)
+            return seed
+
+        stored_manifest = self.manifest()
+        stored_entropy = stored_manifest.pop("seed_entropy")
+        if stored_manifest.get("configuration_hash") != manifest["configuration_hash"]:
+            raise ValueError(
+                f"{self.path} holds a sweep run with a different sink, host or model configuration, cannot resume into it"
+            )
+        if stored_manifest != manifest:
+            raise ValueError(f"{self.path} holds a different sweep, cannot resume into it")
+        return np.random.SeedSequence(int(stored_entropy))
+
+    def manifest(self) -> dict:
+        with open(os.path.join(self.path, self._manifest_name)) as manifest_file:
+            return json.load(manifest_file)
+
+    def completed_batches(self) -> set[int]:
+        return {
+            int(os.path.basename(chunk_path)[len("batch_"):-len(".npz")])
+            for chunk_path in self._chunk_paths()
+        }
+
+    def append(self, batch_output: dict):
+        results = batch_output["results"]
+        chunk = {
+            "point": batch_output["points"],
+            "replicate": batch_output["replicates"],
+            "seed_spawn_key": np.array(batch_output["seed_spawn_key"]),
+            "years": results.years[:results.num_records],
+        }
+        for name, values in batch_output["parameters"].items():
+            chunk[f"parameter__{name}"] = values
+        for index, (population, measure) in enumerate(zip(results.series_populations, results.series_measures)):
+            chunk[f"values__{population}__{measure}"] = np.ascontiguousarray(
+                results.values[:results.num_records, index, :].T
+            )
+
+        # Written under a temporary name and renamed, so an interrupted sweep never
+        # leaves a partial chunk behind that would be mistaken for a finished batch
+        chunk_path = self._chunk_path(batch_output["index"])
+        with open(chunk_path + ".tmp", "wb") as chunk_file:
+            np.savez_compressed(chunk_file, **chunk)
+        os.replace(chunk_path + ".tmp", chunk_path)
+
+    def index(self) -> pd.DataFrame:
+        # One row per run, with where to find it
+        index_tables = []
+        for chunk_path in self._chunk_paths():
+            with np.load(chunk_path) as chunk:
+                chunk_index = {
+                    "chunk": os.path.basename(chunk_path),
+                    "row": np.arange(len(chunk["point"])),
+                    "point": chunk["point"],
+                    "replicate": chunk["replicate"],
+                }
+                for key in chunk.files:
+                    if key.startswith("parameter__"):
+                        chunk_index[key[len("parameter__"):]] = chunk[key]
+            index_tables.append(pd.DataFrame(chunk_index))
+        if len(index_tables) == 0:
+            return pd.DataFrame(columns=["chunk", "row", "point", "replicate"])
+        return pd.concat(index_tables, ignore_index=True)
+
+    def measures(self) -> list[tuple[str, str]]:
+        chunk_paths = self._chunk_paths()
+        if len(chunk_paths) == 0:
+            return []
+        with np.load(chunk_paths[0]) as chunk:
+            return [
+                tuple(key[len("values__"):].split("__", 1))
+                for key in chunk.files if key.startswith("values__")
+            ]
+
+    def read_measure(self, population: str, measure: str, **parameter_filters) -> pd.DataFrame:
+        # parameter_filters select runs by swept parameter, e.g. r0=3.0 or r0=[1.0, 1.5]
+        run_index = self.index()
+        selected = np.full(len(run_index), True)
+        for name, values in parameter_filters.items():
+            selected &= np.isclose(
+                run_index[name].to_numpy()[:, np.newaxis],
+                np.atleast_1d(values)[np.newaxis, :]
+            ).any(axis=1)
+        run_index = run_index[selected]
+
+        measure_tables = []
+        for chunk_name, chunk_runs in run_index.groupby("chunk", sort=True):
+            with np.load(os.path.join(self.path, chunk_name)) as chunk:
+                years = chunk["years"]
+                values = chunk[f"values__{population}__{measure}"][chunk_runs["row"].to_numpy()]
+            measure_table = chunk_runs.drop(columns=["chunk", "row"]).loc[
+                chunk_runs.index.repeat(len(years))
+            ].reset_index(drop=True)
+            measure_table["year"] = np.tile(years, len(chunk_runs))
+            measure_table["value"] = values.reshape(-1)
+            measure_tables.append(measure_table)
+        if len(measure_tables) == 0:
+            return pd.DataFrame(columns=list(run_index.columns.drop(["chunk", "row"])) + ["year", "value"])
+        return pd.concat(measure_tables, ignore_index=True)
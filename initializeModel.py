@@ -1,13 +1,14 @@
 from guinea_worm.model_wrapper import GuineaWormModel
+from guinea_worm.sweep_pool import run_sweep_pool
+from guinea_worm.sweep_store import SweepStore
 import numpy as np
 import matplotlib.pyplot as plt
 from tqdm import tqdm
-from tqdm.contrib.concurrent import process_map
-from multiprocessing import Pool, Manager, cpu_count
+from multiprocessing import cpu_count
 
-def fit_model(larval_death_rate, host_mortality_rate, worm_death_rate, initial_infected, initial_proportion_sink_infected, timestep, endtime, r0, nc_nd, transmission_asymmetry, verbose=False):
-    gw_model = GuineaWormModel(
-        sink_info=[
+def model_configuration(larval_death_rate, host_mortality_rate, worm_death_rate, initial_infected, initial_proportion_sink_infected, timestep, endtime, r0, nc_nd, transmission_asymmetry, verbose=False, reporting_interval=None):
+    return {
+        "sink_info": [
             {#https://www.ncbi.nlm.nih.gov/pmc/articles/PMC6989452/
                 "population_name":"copepod",
                 "infectivity_rate": initial_proportion_sink_infected,
@@ -16,7 +17,7 @@ def fit_model(larval_death_rate, host_mortality_rate, worm_death_rate, initial_i
                 "larval_death_rate": larval_death_rate
             }
         ],
-        host_info=[
+        "host_info": [
             {
                 "num_individuals":1000,
                 "population_name":"dogs",
@@ -32,76 +33,77 @@ def fit_model(larval_death_rate, host_mortality_rate, worm_death_rate, initial_i
                 }}
             } 
         ],
-        model_info={
+        "model_info": {
             "time":0,
             "timestep": timestep,
             "endtime": endtime,
             "r0": r0,
             "NcNd": nc_nd,
             "transmission_asymmetry": transmission_asymmetry,
-            "verbose":verbose
-        })
+            "verbose":verbose,
+            "reporting_interval": reporting_interval,
+        },
+    }
 
-    return gw_model.iterateFullModel()
+def fit_model(larval_death_rate, host_mortality_rate, worm_death_rate, initial_infected, initial_proportion_sink_infected, timestep, endtime, r0, nc_nd, transmission_asymmetry, verbose=False, seed=None, num_replicates=1):
+    gw_model = GuineaWormModel(
+        **model_configuration(
+            larval_death_rate, host_mortality_rate, worm_death_rate, initial_infected,
+            initial_proportion_sink_infected, timestep, endtime, r0, nc_nd, transmission_asymmetry, verbose
+        ),
+        seed=seed,
+        num_replicates=num_replicates)
 
-def fit_data(params_to_fit):
-    processed_data = fit_model(
-            larval_death_rate = 1/30, 
-            host_mortality_rate = (1/5)/360,
-            worm_death_rate = 1/360,
-            initial_infected=0,
-            initial_proportion_sink_infected=params_to_fit["initial_infected"],
-            timestep=params_to_fit["timestep"],
-            endtime=360*params_to_fit["max_year"],
-            r0=params_to_fit["r0"],
-            nc_nd=params_to_fit["nc_nd"],
-            transmission_asymmetry=params_to_fit["asymmetry"],
-            verbose=params_to_fit["verbose"]
-        )
-    processed_data["r0"] = params_to_fit["r0"]
-    processed_data["asymmetry"] = params_to_fit["asymmetry"]
-    processed_data["run_num"] = params_to_fit["run_num"]
-    processed_data["nd_nc"] = 1/params_to_fit["nc_nd"]
-    processed_data["initial_infected"] = params_to_fit["initial_infected"]
-    processed_data.to_csv(
-        f"output_data/model_output_initinf_{params_to_fit['initial_infected']}_ncnd_{params_to_fit['nc_nd']}_r0_{params_to_fit['r0']}_asym_{params_to_fit['asymmetry']}_runnum_{params_to_fit['run_num']}.csv"
-    )
+    return gw_model.iterateFullModel()
 
 if __name__ == '__main__':
     skip_fit = False
     max_year=10
+    # Set to a previous sweep's seed_entropy to reproduce it. A sweep resumed
+    # into an existing store always reuses the store's seed.
+    seed_entropy = None
+    # Every batch of the sweep is streamed into this store; rerunning the script
+    # skips the batches it already holds
+    sweep_store = SweepStore("output_data/sweep")
 
-    input_params = []
     if not skip_fit:
-        r0s = np.arange(1, 5.1, 0.5)
-        asymmetries = np.arange(1, 2.01, 0.1)
-        nc_nds = 1 / np.array([0.05, 0.50, 0.95])
-        initial_infecteds = [0.5, 0.25, 0.1]
         num_iters=10
-        total_runs = len(asymmetries) * len(r0s) * len(nc_nds) * len(initial_infecteds) * num_iters
-        for initial_infected in initial_infecteds:
-            for nc_nd in nc_nds:
-                for r0 in r0s:
-                    for asymmetry in asymmetries:
-                        for run_num in range(0, num_iters):
-                            input_params.append({
-                                "max_year": max_year,
-                                "timestep": 15,
-                                "initial_infected": initial_infected,
-                                "r0": r0,
-                                "nc_nd": nc_nd,
-                                "asymmetry": asymmetry,
-                                "verbose": False,
-                                "run_num": run_num
-                            })
-                        #print(f"Initial Inf: {initial_infected}. NCND: {nc_nd}. R0: {r0}. Pi: {asymmetry}. Run Num: {run_num}")
+        sweep_config = model_configuration(
+            larval_death_rate = 1/30, 
+            host_mortality_rate = (1/5)/360,
+            worm_death_rate = 1/360,
+            initial_infected=0,
+            initial_proportion_sink_infected=None,
+            timestep=15,
+            endtime=360*max_year,
+            r0=None,
+            nc_nd=None,
+            transmission_asymmetry=None,
+            # the sweep is only analyzed year by year
+            reporting_interval=360,
+        )
+        # every point of the grid runs num_iters replicates; points are batched
+        # along the replicate axis so each worker task is one array program
+        parameter_values = {
+            "infectivity_rate": [0.5, 0.25, 0.1],
+            "NcNd": 1 / np.array([0.05, 0.50, 0.95]),
+            "r0": np.arange(1, 5.1, 0.5),
+            "transmission_asymmetry": np.arange(1, 2.01, 0.1),
+        }
         num_cpus = cpu_count()
-        with tqdm(total=total_runs) as pbar:
-            with Pool(processes=num_cpus-2) as pool:
-                for _ in pool.imap_unordered(fit_data, input_params):
-                    pbar.update(1)
-                    
-        #_ = process_map(fit_data, range(0, len(input_params)), params_to_fit=input_params, max_workers=num_cpus-2, chunksize=int(total_runs/70))
+        # workers reuse their models from batch to batch and hand results back
+        # through shared memory
+        run_sweep_pool(
+            parameter_values,
+            **sweep_config,
+            num_replicates=num_iters,
+            points_per_batch=16,
+            seed=seed_entropy,
+            processes=num_cpus-2,
+            chunksize=4,
+            store=sweep_store,
+            progress=lambda batches, total: tqdm(batches, total=total),
+        )
 
     if skip_fit:
         processed_data = fit_model(
@@ -125,6 +127,6 @@ if __name__ == '__main__':
         axes[1].set_title("female worm prev")
         axes[2].plot(processed_data.loc[processed_data["measure"] == "emergence_copepod", "year"], processed_data.loc[processed_data["measure"] == "emergence_copepod", "value"])
         axes[2].set_title("worm emergences")
-        axes[3].plot(processed_data.loc[processed_data["measure"] == "Re", "year"], processed_data.loc[processed_data["measure"] == "Re", "value"])
+        axes[3].plot(processed_data.loc[processed_data["measure"] == "Re_copepod", "year"], processed_data.loc[processed_data["measure"] == "Re_copepod", "value"])
         axes[3].set_title("Re")
         plt.show()
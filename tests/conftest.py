@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from guinea_worm.model_wrapper import GuineaWormModel
+
+
+def model_configuration(num_individuals: int = 200, years: int = 2, **host_options) -> dict:
+    host_info = {
+        "num_individuals": num_individuals,
+        "population_name": "dogs",
+        "mortality_rate": (1/5)/360,
+        "worm_death_rate": 1/360,
+        "worm_mating_probability": 1,
+        "ke": 0.3,
+        "initial_infected": 5,
+        "worm_maturity_age_days": 0,
+        "max_worm_age": 360,
+        "sink_interaction_values": {"copepod": {"interaction": np.full(num_individuals, 1)}},
+    }
+    host_info.update(host_options)
+    return {
+        "sink_info": [{
+            "population_name": "copepod",
+            "infectivity_rate": 0.25,
+            "density": 250,
+            "size": 4500,
+            "larval_death_rate": 1/30,
+        }],
+        "host_info": [host_info],
+        "model_info": {
+            "time": 0,
+            "timestep": 15,
+            "endtime": 360 * years,
+            "r0": 3,
+            "NcNd": 20,
+            "transmission_asymmetry": 1.2,
+        },
+    }
+
+
+@pytest.fixture
+def build_model():
+    # build_model(seed, num_replicates=1, years=2, **host_options) -> GuineaWormModel
+    def build(seed: int, num_replicates: int = 1, years: int = 2, **host_options) -> GuineaWormModel:
+        return GuineaWormModel(
+            **model_configuration(years=years, **host_options), seed=seed, num_replicates=num_replicates
+        )
+    return build
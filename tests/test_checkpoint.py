@@ -0,0 +1,16 @@
+import pandas as pd
+import pytest
+
+
+@pytest.mark.parametrize("worm_storage", ["dense", "sparse"])
+def test_resumed_run_matches_uninterrupted_run(build_model, tmp_path, worm_storage):
+    uninterrupted = build_model(seed=4, num_replicates=2, worm_storage=worm_storage).iterateFullModel()
+
+    interrupted = build_model(seed=4, num_replicates=2, worm_storage=worm_storage)
+    for _ in range(30):
+        interrupted.model.iterateModel()
+    interrupted.save_checkpoint(tmp_path / "checkpoint.npz")
+
+    resumed = build_model(seed=99, num_replicates=2, worm_storage=worm_storage)
+    resumed.load_checkpoint(tmp_path / "checkpoint.npz")
+    pd.testing.assert_frame_equal(resumed.iterateFullModel(), uninterrupted)
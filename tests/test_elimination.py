@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+from guinea_worm.model.intervention import Intervention
+from guinea_worm.model_wrapper import GuineaWormModel
+from conftest import model_configuration
+
+
+def run_model(stop_on_elimination: bool, interventions: list[Intervention]):
+    configuration = model_configuration(years=4)
+    configuration["model_info"].update(
+        r0=0.5, stop_on_elimination=stop_on_elimination, interventions=interventions
+    )
+    return GuineaWormModel(**configuration, seed=3).iterateFullModel()
+
+
+@pytest.mark.parametrize("interventions", [
+    [],
+    [Intervention("abate", 720, 721, intervention_event_times=[720], efficacy=0.9)],
+])
+def test_stopping_on_elimination_matches_a_full_run(interventions):
+    full_run = run_model(False, interventions)
+    stopped_run = run_model(True, interventions)
+    assert len(stopped_run) == len(full_run)
+    np.testing.assert_array_equal(stopped_run["year"], full_run["year"])
+    np.testing.assert_array_equal(stopped_run["measure"], full_run["measure"])
+    np.testing.assert_allclose(stopped_run["value"], full_run["value"], rtol=1e-9, atol=1e-12)
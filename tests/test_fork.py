@@ -0,0 +1,41 @@
+import queue
+import pandas as pd
+from guinea_worm.model.events import FinishedEvent
+
+
+def test_branches_share_history_and_diverge_after_fork(build_model):
+    parent = build_model(seed=4, num_replicates=2, years=4)
+    parent.run_until(360 * 2)
+    records_at_fork = parent.model.results.num_records
+    history = parent.model.results.values[:records_at_fork].copy()
+
+    branches = parent.fork(2)
+    for branch in branches:
+        assert (branch.model.results.values[:records_at_fork] == history).all()
+    branch_data = [branch.iterateFullModel() for branch in branches]
+    assert not branch_data[0].equals(branch_data[1])
+    assert parent.model.results.num_records == records_at_fork
+
+
+def test_fork_is_reproducible(build_model):
+    runs = []
+    for _ in range(2):
+        parent = build_model(seed=4, num_replicates=2, years=3)
+        parent.run_until(360)
+        runs.append(parent.fork(2)[1].iterateFullModel())
+    pd.testing.assert_frame_equal(runs[0], runs[1])
+
+
+def test_branches_report_to_the_parent_observers(build_model):
+    events = queue.Queue()
+    parent = build_model(seed=4, years=2)
+    parent.model.add_observer(events.put)
+    parent.run_until(360)
+    num_parent_events = events.qsize()
+
+    branches = parent.fork(2)
+    assert all(branch.model.observers == [events.put] for branch in branches)
+    branches[0].iterateFullModel()
+    reported_events = [events.get() for _ in range(events.qsize())]
+    assert len(reported_events) > num_parent_events
+    assert isinstance(reported_events[-1], FinishedEvent)
@@ -0,0 +1,35 @@
+import numpy as np
+from guinea_worm.model.intervention import Intervention, InterventionScheduler
+
+
+def test_overlapping_water_treatments_keep_the_sink_treated(build_model):
+    model = build_model(seed=0).model
+    sink_population = model.sink_populations["copepod"]
+    scheduler = InterventionScheduler([
+        Intervention("water_treatment", 40, 200, intervention_interval=40, efficacy=0.5, duration=60)
+    ])
+    treated_times = []
+    for time in range(0, 300, 10):
+        scheduler.apply_due_events(model, time)
+        if sink_population.treatment_factor < 1:
+            treated_times.append(time)
+    # Treatments start at 40, 80, 120 and 160, and the last one ends at 220
+    assert treated_times == list(range(40, 220, 10))
+
+
+def test_newborn_hosts_are_not_tethered(build_model):
+    model = build_model(seed=0, initial_infected=200).model
+    model.iterateModel()
+    host_population = model.host_populations["dogs"]
+    scheduler = InterventionScheduler([
+        Intervention("tethering", 0, 360, intervention_event_times=[model.time], efficacy=1.0, duration=360)
+    ])
+    scheduler.apply_due_events(model, model.time)
+    tethered = np.flatnonzero(host_population.tethered_until > 0)
+    assert len(tethered) > 0
+
+    host_population.process_death(tethered)
+    np.testing.assert_array_equal(host_population.tethered_until[tethered], 0)
+    np.testing.assert_array_equal(
+        host_population.sink_interaction[tethered], host_population.base_sink_interaction[tethered]
+    )
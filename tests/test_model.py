@@ -0,0 +1,27 @@
+import numpy as np
+from guinea_worm.model_wrapper import GuineaWormModel
+from conftest import model_configuration
+
+
+def test_every_sink_gets_its_own_re_series():
+    configuration = model_configuration(num_individuals=50, years=1)
+    pond = dict(configuration["sink_info"][0], population_name="pond", infectivity_rate=0.01)
+    configuration["sink_info"].append(pond)
+    configuration["host_info"][0]["sink_interaction_values"]["pond"] = {"interaction": np.full(50, 0.5)}
+    model_data = GuineaWormModel(**configuration, seed=0).iterateFullModel()
+
+    re_values = model_data[model_data["measure"].str.startswith("Re")].groupby("measure")["value"].last()
+    assert sorted(re_values.index) == ["Re_copepod", "Re_pond"]
+    assert re_values["Re_copepod"] != re_values["Re_pond"]
+
+
+def test_records_are_counted_from_an_unaligned_start_time():
+    configuration = model_configuration(num_individuals=50)
+    configuration["model_info"].update(time=5, endtime=365)
+    model_data = GuineaWormModel(**configuration, seed=0).iterateFullModel()
+    assert model_data["year"].nunique() == 26
+
+    configuration["model_info"].update(reporting_interval=60)
+    model = GuineaWormModel(**configuration, seed=0)
+    model_data = model.iterateFullModel()
+    assert model_data["year"].nunique() == len(model.model.results.years) == 8
@@ -0,0 +1,59 @@
+import copy
+import numpy as np
+from guinea_worm.model.population import HostPopulation
+
+
+def host_population(num_individuals: int, mortality_rate: float, seed: int) -> HostPopulation:
+    return HostPopulation(
+        num_individuals=num_individuals,
+        population_name="dogs",
+        mortality_rate=mortality_rate,
+        worm_death_rate=1/360,
+        worm_mating_probability=1,
+        ke=0.3,
+        initial_infected=0,
+        worm_maturity_age_days=0,
+        max_worm_age=360,
+        sink_interaction_values={"copepod": {"interaction": np.full(num_individuals, 1)}},
+        rng=np.random.default_rng(seed),
+    )
+
+
+def test_host_survival_follows_the_per_step_hazard():
+    # Dying with probability 1 - exp(-mortality_rate * age) at every step of length
+    # timestep, a host survives k steps with probability exp(-mortality_rate * timestep * k (k + 1) / 2)
+    num_individuals, mortality_rate, timestep = 20000, (1/5)/360, 15
+    population = host_population(num_individuals, mortality_rate, seed=0)
+    for steps in range(1, 31):
+        population.turnover(timestep)
+        # Hosts of the first generation are the ones never replaced
+        surviving = np.mean(population.birth_time == 0)
+        expected = np.exp(-mortality_rate * timestep * steps * (steps + 1) / 2)
+        standard_error = np.sqrt(expected * (1 - expected) / num_individuals)
+        assert abs(surviving - expected) < 5 * standard_error + 1e-12
+
+
+def test_restored_population_continues_like_the_original():
+    timestep = 15
+    original = host_population(500, (1/2)/360, seed=1)
+    for _ in range(10):
+        original.turnover(timestep)
+
+    restored = host_population(500, (1/2)/360, seed=2)
+    restored.set_state(original.get_state())
+    restored.set_rng(copy.deepcopy(original.rng))
+    assert original._deaths_by_time.keys() == restored._deaths_by_time.keys()
+
+    for _ in range(40):
+        original.turnover(timestep)
+        restored.turnover(timestep)
+    np.testing.assert_array_equal(restored.birth_time, original.birth_time)
+    np.testing.assert_array_equal(restored.death_time, original.death_time)
+    np.testing.assert_array_equal(restored.exposure_heterogeneity, original.exposure_heterogeneity)
+
+
+def test_hosts_can_die_before_the_first_turnover():
+    population = host_population(100, (1/5)/360, seed=3)
+    population.process_death(np.array([0, 1]))
+    population.turnover(15)
+    assert (population.death_time > population._time).all()
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+from guinea_worm.model.intervention import Intervention
+from guinea_worm.sweep import run_sweep
+from guinea_worm.sweep_pool import run_sweep_pool
+from guinea_worm.sweep_store import SweepStore
+from conftest import model_configuration
+
+PARAMETER_VALUES = {"infectivity_rate": [0.5, 0.1], "r0": [1.0, 2.0, 3.0], "transmission_asymmetry": [1.0, 1.5]}
+
+
+def sweep_configuration() -> dict:
+    configuration = model_configuration(num_individuals=100, years=2)
+    configuration["model_info"]["reporting_interval"] = 360
+    return configuration
+
+
+@pytest.mark.parametrize("points_per_batch, processes", [(5, 1), (2, 2)])
+def test_pooled_sweep_matches_serial_sweep(points_per_batch, processes):
+    # 12 points in batches of 5: the single worker reuses its models, including
+    # one for the smaller last batch. In batches of 2, the 6 batches share 2 slots
+    # of the shared results.
+    sweep_arguments = dict(num_replicates=2, points_per_batch=points_per_batch, seed=42)
+    serial = run_sweep(PARAMETER_VALUES, **sweep_configuration(), **sweep_arguments)
+    pooled = run_sweep_pool(
+        PARAMETER_VALUES, **sweep_configuration(), **sweep_arguments, processes=processes, chunksize=1
+    )
+
+    key = ["point", "replicate", "year", "population", "measure"]
+    pd.testing.assert_frame_equal(
+        pooled.sort_values(key).reset_index(drop=True)[serial.columns],
+        serial.sort_values(key).reset_index(drop=True),
+    )
+
+
+def test_reset_model_matches_freshly_built_model(build_model):
+    fresh = build_model(seed=11, num_replicates=3)
+    fresh.model.set_parameters(r0=[2, 3, 4])
+    fresh.model.sink_populations["copepod"].reset([0.1, 0.2, 0.3])
+    fresh_data = fresh.iterateFullModel()
+
+    reused = build_model(seed=5, num_replicates=3)
+    first_run = reused.iterateFullModel()
+    first_values = first_run["value"].to_numpy().copy()
+    reused.reset(seed=11, r0=[2, 3, 4], infectivity_rate=[0.1, 0.2, 0.3])
+    pd.testing.assert_frame_equal(reused.iterateFullModel(), fresh_data)
+    # Frames of an earlier run are not overwritten by the next one
+    np.testing.assert_array_equal(first_run["value"].to_numpy(), first_values)
+
+
+def test_sweep_runners_merge_batch_profiles():
+    sweep_arguments = dict(num_replicates=2, points_per_batch=5, seed=42, profile=True)
+    serial, serial_profile = run_sweep(PARAMETER_VALUES, **sweep_configuration(), **sweep_arguments)
+    pooled, pooled_profile = run_sweep_pool(PARAMETER_VALUES, **sweep_configuration(), **sweep_arguments, processes=1)
+
+    assert len(serial) == len(pooled)
+    assert serial_profile["steps"] == pooled_profile["steps"] > 0
+    for name, totals in serial_profile["phases"].items():
+        assert pooled_profile["phases"][name]["rng_draws"] == totals["rng_draws"]
+
+
+def test_stored_sweeps_with_interventions(tmp_path):
+    def configuration_with_abate(event_time: int) -> dict:
+        configuration = sweep_configuration()
+        configuration["model_info"]["interventions"] = [
+            Intervention("abate", event_time, event_time + 1, intervention_event_times=[event_time], efficacy=0.9)
+        ]
+        return configuration
+
+    sweep_arguments = dict(num_replicates=2, points_per_batch=5, seed=42)
+    serial_store = run_sweep(
+        PARAMETER_VALUES, **configuration_with_abate(360), **sweep_arguments, store=SweepStore(tmp_path / "serial")
+    )
+    pooled_store = run_sweep_pool(
+        PARAMETER_VALUES, **configuration_with_abate(360), **sweep_arguments,
+        store=SweepStore(tmp_path / "pooled"), processes=1,
+    )
+    assert serial_store.manifest() == pooled_store.manifest()
+    key = ["point", "replicate", "year"]
+    pd.testing.assert_frame_equal(
+        pooled_store.read_measure("copepod", "infective_larvae").sort_values(key).reset_index(drop=True),
+        serial_store.read_measure("copepod", "infective_larvae").sort_values(key).reset_index(drop=True),
+    )
+
+    with pytest.raises(ValueError, match="different sink, host or model configuration"):
+        run_sweep(
+            PARAMETER_VALUES, **configuration_with_abate(540), **sweep_arguments, store=SweepStore(tmp_path / "serial")
+        )
@@ -0,0 +1,32 @@
+import numpy as np
+from guinea_worm.model.worms import WORM_STORAGE_BACKENDS
+
+
+def test_storage_backends_agree_when_worm_deaths_are_deterministic():
+    # Without background worm deaths, worms only die, and emerge, at max_worm_age
+    individuals = 6
+    backends = {
+        name: backend(
+            worm_death_rate=0, max_worm_age=5, individuals=individuals, mating_probability=1,
+            worm_maturity_age_days=0, rng=np.random.default_rng(0),
+        )
+        for name, backend in WORM_STORAGE_BACKENDS.items()
+    }
+    rng = np.random.default_rng(1)
+    for step in range(12):
+        hosts = np.flatnonzero(rng.random(individuals) < 0.5)
+        new_male_worms = rng.integers(0, 3, len(hosts))
+        new_female_worms = rng.integers(0, 3, len(hosts))
+        interacted = rng.random(individuals) < 0.7
+        dead_hosts = np.array([step % individuals]) if step % 4 == 3 else np.array([], dtype=np.int64)
+        observed = {}
+        for name, worms in backends.items():
+            worms.injest_worms(hosts, new_male_worms, new_female_worms)
+            worms.process_host_death(dead_hosts)
+            worms.age(1)
+            observed[name] = (
+                worms.get_total_worms(), worms.get_female_worm_burden(), worms.worms_emerging(interacted)
+            )
+        for dense_values, sparse_values in zip(observed["dense"], observed["sparse"]):
+            np.testing.assert_array_equal(dense_values, sparse_values)
+